@@ -36,11 +36,22 @@ import getopt
 import numpy as np
 
 from cnorm_pack import cnorm
-from render_pack import render
 from prep_eto_pack import prep_eto
 from somclass_pack import somclass
 from wrf_source_pack import wrf_source
 
+from bmu import find_BMUs
+from cramer import readsom
+from somfile import is_som, load_som, som_errors
+from eto_prep import eto_prep, validated as eto_prep_validated
+from day_pool import extract_days
+from feature_cache import feature_cache
+from features import feature_cube, day_features, read_datafiles
+from prefetch import day_reader
+from render_pool import render_pool, read_lut
+from eto_grid import eto_writer
+from class_stats import class_stats, write_stats
+
 # point to target data files
 fname = '/home/agrineer/eto_study/scripts/dates/full2021.txt'
 outdir = '2021-GA/SOM_5x5_4_00724_3_10/'
@@ -56,20 +67,93 @@ output_file = outdir + '2017-2021_labels.npy'    # labels naming based on SOM tr
 
 src = wrf_source.wrf_source( 'wrf_source' )
 
-prep = prep_eto.prep_eto( 'prep_eto' )
+# prepare the ETo variables with the vectorized float32 kernel of
+# eto_prep.py instead of the prep_eto operator; match collect_data.py.
+# held back until validated against prep_eto, see collect_data.py
+vector_prep = False
+
+if vector_prep and not eto_prep_validated:
+    print( 'apply_class: eto_prep.py is not validated against prep_eto '
+           '(see benchmarks/bench_prep.py)...exiting', file=sys.stderr )
+    sys.exit( 1 )
+
+if vector_prep:
+    prep = eto_prep( 'eto_prep' )
+else:
+    prep = prep_eto.prep_eto( 'prep_eto' )
 prep.params.albedo = 0.23    # be sure to match this with collect_data.py
 
 cnrm = cnorm.cnorm( 'cnorm' )
 cnrm.params.clip = True
 cnrm.params.filepath = '2017-2021.coeffs'  # normalization coeffs to use
 
+# the weights file may be a .labels file or its binary .som companion
+# (see somfile.py, convert with labels2som.py); the somclass operator
+# (batchdays = 0) reads .labels files only
 sclass = somclass.somclass( 'somclass' )
 sclass.params.weightfile = 'LABELS_2017-2021/5x5_4_00724_3/2017-2021_5x5_4_00724_10.labels'
 sclass.params.nclasses = 25  # match with train grid
 
-# render labels as image
-rndr = render.render( 'render' )
-rndr.readlut( './luts/eighthbow.lut' )
+# render labels as images. images are colorized with the lut and
+# written by render_threads background threads so JPEG encoding stays
+# off the classification path. set images to False to skip them and
+# render later from the labels file with render_labels.py
+images = True
+lutfile = './luts/eighthbow.lut'
+render_threads = 2
+
+# read each wrfout file once (all 25 time slices) and prepare the 24
+# hours in one "prep_eto" call. False uses the wrf_source operator hour
+# by hour. unvalidated: the row orientation and prep_eto over hours laid
+# side by side have not been checked against wrf_source; it stays off
+# until benchmarks/check_single_pass.py passes on a real wrfout file
+single_pass = False
+
+# keep un-normalized daily feature cubes in cachedir so days prepared
+# before (same wrfout file, band string and albedo) are not read and
+# prepared again. least recently used days are removed past cachemax
+# bytes. None turns the cache off.
+cachedir = None                # eg. '/datax/eto_cache/'
+cachemax = 200*1024**3         # 200 GB; about 9000 days
+
+# number of worker processes extracting days in parallel. with more
+# than one worker, pooldays days at a time are extracted into a scratch
+# file in outdir and then classified in day order.
+nworkers = 1
+pooldays = 64
+
+# with one worker, read up to prefetch days ahead in a background
+# thread while earlier days are prepared and classified (single_pass
+# only). a summary of read and wait times is printed at the end to
+# size it; 0 turns it off.
+prefetch = 2
+
+# classify batchdays days per call: the days are normalized together and
+# labelled against the SOM weights with one vectorized distance
+# computation per block of rows, written straight into the labels array.
+# larger batches use more memory (22 MB a day) for more throughput.
+# metric must be the distance somclass uses. 0 uses the somclass
+# operator one day at a time; it stays the default until the batch
+# labels have been shown to equal the somclass labels.
+batchdays = 0
+metric = 'euclidean'
+
+# with batchdays, label the first day with the somclass operator too
+# and stop if any pixel differs (needs a .labels weights file)
+checkclass = True
+
+# also write reference ETo grids (see eto_grid.py) of the classified
+# days, computed from the prepared days before normalization:
+# <etoprefix>_daily.npy (mm/day) and, with eto_hourly,
+# <etoprefix>_hourly.npy (mm/hour). None skips them.
+etoprefix = None               # eg. outdir + '2021_eto'
+eto_hourly = True
+
+# per-class daily ETo statistics (see class_stats.py) from the labels
+# and the daily ETo grid: a (ndays,nclasses,nstats) table of class
+# area fraction, pixel count, mean and variance, written as .npy, or
+# as .csv with one line per day and class. needs etoprefix; None skips
+statsfile = None               # eg. outdir + 'class_eto.csv'
 
 # --------------------------------------------------------------------------
 
@@ -78,30 +162,88 @@ def print_params(out):
     print( 'out dir      =', outdir, file=out )
     print( 'numpy labels =', output_file, file=out )
     print( 'coeffs file  =', cnrm.params.filepath, file=out )
-    print( 'weights file =', sclass.params.weightfile, file=out, flush=True)
+    print( 'weights file =', sclass.params.weightfile, file=out )
+
+    # training errors from the weights file header
+    qe, te = som_errors( load_som( sclass.params.weightfile )[0] )
+    print( 'weights QE   =', qe, file=out )
+    print( 'weights TE   =', te, file=out, flush=True )
+    
+# normalize, classify and render the feature cubes of days k, k+1, ...
+# stacked along y in buf
+def classify_days( k, buf ):
+
+    nb = buf.shape[0]//171
+
+    # reference ETo from the un-normalized days
+    if etoprefix != None:
+        eto.put_days( k, buf, nvars )
+
+    # normalize with given coefficient file (above)
+    cnrm.source = buf
+    cnrm.run()
+
+    # classify
+    if batchdays > 0:
+        labels = find_BMUs( weights, cnrm.sink, metric=metric )
+
+        # populate daily classification label array for these days
+        labels = labels.reshape( (nb,171,171) )
+
+        if checkclass and k == 0:
+            sclass.source = cnrm.sink[:171]
+            sclass.run()
+            ndiff = np.count_nonzero( sclass.sink[:,:,0] != labels[0] )
+            if ndiff > 0:
+                print( 'apply_class:', metric, 'labels differ from somclass',
+                       'on', ndiff, 'pixels of the first day...exiting',
+                       file=sys.stderr )
+                sys.exit( 1 )
+        dclass[:,:,k:k+nb] = np.moveaxis( labels, 0, 2 )
+
+    else:
+        for j in range( nb ):
+            sclass.source = cnrm.sink[j*171:(j+1)*171] # normalized data
+            #sclass.source = buf[j*171:(j+1)*171]      # non-normalized data
+                                                       # comment out
+                                                       # normalize code above
+            sclass.run()
+
+            # populate daily classification label array for this day
+            dclass[:,:,k+j] = sclass.sink[:,:,0]
     
+    # colorize the labels, write out as jpg; png does not play well with
+    # html video tag implementation. (use ffmpeg to animate and force size to
+    # by divisible by two.
+    # eg. ffmpeg -r 3 -i SOM%4d.jpg -vf scale=256:256  SOM.mp4
+    if images:
+        for j in range( nb ):
+            rpool.put( dclass[:,:,k+j], outdir + 'IMAGES/SOM%04d.jpg'%(k+j) )
+
 # main
 
-# open file with datafile list
-datafiles = open( fname )
+# datafile list
+datafiles = read_datafiles( fname )
 
 # check if datafiles exist
 for f in datafiles:
-    if not os.path.isfile( f.strip() ):
+    if not os.path.isfile( f ):
         print( 'apply_class:', f, ' does not exist...exiting',
                file=sys.stderr )
         sys.exit( 1 )
-datafiles.seek( 0, 0 )
 
 # find number of days
-ndays = len( datafiles.readlines() ) # make sure input file has no trailing '\n'
-                                     # TODO: filter file trailing '\n' 
-datafiles.seek( 0, 0 )               # reset file pointer to beginning
+ndays = len( datafiles )
+
+if statsfile != None and etoprefix == None:
+    print( 'apply_class: class statistics need etoprefix...exiting',
+           file=sys.stderr )
+    sys.exit( 1 )
 
 # output directory for daily class images
 if not os.path.isdir( outdir ):
     os.mkdir( outdir )
-if not os.path.isdir( outdir + 'IMAGES' ):
+if images and not os.path.isdir( outdir + 'IMAGES' ):
     os.mkdir( outdir + 'IMAGES' )      
 
 # report parameters to file and stderr
@@ -113,6 +255,25 @@ print_params( sys.stderr )
 # create daily class (label) array used for secondary SOM classification
 dclass = np.empty( (171,171,ndays), dtype=np.uint8)   # labels are ubytes
 
+if etoprefix != None:
+    eto = eto_writer( etoprefix, ndays, 171, 171, eto_hourly )
+
+# som weights for batch classification
+if batchdays > 0:
+    weights = readsom( sclass.params.weightfile )
+    if checkclass and is_som( sclass.params.weightfile ):
+        print( 'apply_class: somclass cannot read',
+               sclass.params.weightfile, 'to check the labels',
+               '...exiting', file=sys.stderr )
+        sys.exit( 1 )
+elif is_som( sclass.params.weightfile ):
+    print( 'apply_class: somclass cannot read', sclass.params.weightfile,
+           '...exiting', file=sys.stderr )
+    sys.exit( 1 )
+
+# days per classify_days call
+nbatch = max( 1, batchdays )
+
 nvars = 8 # number of variables in hourly feature space
 
 # template band string; 0-indexed; string 'ts' gets
@@ -120,94 +281,93 @@ nvars = 8 # number of variables in hourly feature space
 # indicate which bands get extracted from WRF source file
 bandstr = 'TSK:ts,EMISS:ts,SWDOWN:ts,GLW:ts,GRDFLX:ts,T2:ts,PSFC:ts,Q2:ts,U10:ts,V10:ts'
 
+if cachedir != None:
+    cache = feature_cache( cachedir, cachemax )
+else:
+    cache = None
+
+if images:
+    rpool = render_pool( read_lut( lutfile ), render_threads )
+
 # classify and render image to file
-k = 0
-for f in datafiles:
+if nworkers > 1:
+
+    # scratch file holding pooldays feature cubes, stacked along y
+    # TODO:should discover input dimensions
+    scratchfile = outdir + 'features.npy'
+    scratch = np.lib.format.open_memmap( scratchfile, mode='w+',
+                                         dtype=np.float32,
+                                         shape=(pooldays*171,171,nvars*24) )
+
+    for first in range( 0, ndays, pooldays ):
+        files = datafiles[first:first+pooldays]
+
+        print( 'extracting days', first, 'to', first+len(files)-1, 'with',
+               nworkers, 'workers', file=sys.stderr, flush=True )
+        extract_days( files, scratchfile, 0, nworkers, prep.params.albedo,
+                      bandstr, nvars, single_pass, cachedir, cachemax,
+                      vector_prep )
+
+        for j in range( 0, len(files), nbatch ):
+            nb = min( nbatch, len(files)-j )
+            classify_days( first+j, scratch[j*171:(j+nb)*171] )
 
-    f = f.strip()
-    print( 'processing ', f, file=sys.stderr )
+    del scratch
+    os.remove( scratchfile )
 
-    # create time augmented numpy array
+else:
+
+    # batch of time augmented feature cubes, stacked along y;
+    # each day's cube is filled in place
     # TODO:should discover input dimensions
-    aug = np.empty( (171,171,nvars*24), dtype=np.float32 )
+    batch = np.empty( (nbatch*171,171,nvars*24), dtype=np.float32 )
 
-    # run through hourly slices to augment feature space
-    
-    '''
-    # use this for one time slice over the day
-    # starting at 2:00am Ecuador time, ending 1:00am next day
-    # start at 2:00am because time-slice 0 (1:00am) has value
-    # issues due to non-spinup
-    for i in range(1,25):
-
-        # construct hourly band string, replace 'ts' with time slice value
-        src.params.bandstr = bandstr.replace('ts','%02d'%i )
-    '''
-    # read two slices and average actual values over the day
-    # NOTE: should be using spin-up values
-    for i in range(0,24):
-
-        # construct wrf_source band string, replace 'ts' with first time slice value
-        bstr = bandstr.replace('ts','%02d'%i )
-
-        # second time slice is added to string
-        # if operator "prep_eto" sees 10 bands it will implement directly
-        # if operator "prep_eto" sees 20 bands it will implement two sets
-        # and return an average
-        # tell the source operator to get both time slices
-        src.params.bandstr = bstr + ',' + bandstr.replace('ts','%02d'%(i+1) )
-        
-        # -------------------------------------------------------
-        
-        # read the file with specified bands to extract
-        src.params.filepath = f
-        src.run()
-
-        # process raw variables to get actual input values for Penman-Montieth
-        # the operator "prep_eto" does the hourly averaging
-        prep.source = src.sink
-        prep.run()
-
-        # time slice augmentation of variables
-        # implicitely introduces diurnal weather influences over time
-        if i == 0:
-            aug = prep.sink[:,:,:nvars]
-        else:
-            aug = np.append( aug, prep.sink[:,:,:nvars], axis=2 )
-                         
-        print( '.', end='', file=sys.stderr, flush=True )
-        
-    print( '\n', file=sys.stderr,flush=True )
-  
-    # normalize with given coefficient file (above)
-    cnrm.source = aug
-    cnrm.run()
+    reader = day_reader( datafiles, bandstr, prefetch, single_pass, cache,
+                         prep, nvars )
 
-    # classify
-    sclass.source = cnrm.sink # use this for normalized data
-    #sclass.source = aug      # use this for non-normalized data
-                              # comment out normalize code above 
+    for first in range( 0, ndays, nbatch ):
+        nb = min( nbatch, ndays-first )
 
-    sclass.run()
+        for j in range( nb ):
+            f = datafiles[first+j]
+            block = cached = None
+            if reader != None:
+                f, block, cached = next( reader )
+            print( 'processing ', f, file=sys.stderr )
 
-    # populate daily classification label array for this day
-    dclass[:,:,k] = sclass.sink[:,:,0]
-    
-    # colorize the labels, write out as jpg; png does not play well with
-    # html video tag implementation. (use ffmpeg to animate and force size to
-    # by divisible by two.
-    # eg. ffmpeg -r 3 -i SOM%4d.jpg -vf scale=256:256  SOM.mp4
-    rndr.source = sclass.sink
-    rndr.params.filepath = outdir + 'IMAGES/SOM%04d.jpg'%k 
-    rndr.run()
-    
-    k += 1
-    
-datafiles.close()
+            # time slice augmentation of variables
+            # implicitely introduces diurnal weather influences over time
+            cube = feature_cube( 171, 171, 24, nvars,
+                                 buf=batch[j*171:(j+1)*171] )
+            day_features( f, src, prep, bandstr, nvars, single_pass, cube,
+                          cache, block, cached )
+
+        classify_days( first, batch[:nb*171] )
+
+    if reader != None:
+        reader.report()
+
+if images:
+    print( 'writing images...', end='', file=sys.stderr, flush=True )
+    rpool.close()
+    print( 'done', file=sys.stderr, flush=True )
+
+if etoprefix != None:
+    eto.close()
+    print( 'ETo grids written to ' + etoprefix + '_*.npy', file=sys.stderr,
+           flush=True )
 
 # write out daily labels for secondary SOM classification
 print( 'writing daily labels file...' + output_file, end='',
        file=sys.stderr, flush=True )
 
-dclass.dump( output_file )
+np.save( output_file, dclass )
 print( ' done', file=sys.stderr, flush=True )
+
+if statsfile != None:
+    print( 'writing class statistics...' + statsfile, end='',
+           file=sys.stderr, flush=True )
+    table = class_stats( output_file, etoprefix + '_daily.npy',
+                         sclass.params.nclasses )
+    write_stats( statsfile, table, fname )
+    print( ' done', file=sys.stderr, flush=True )
@@ -0,0 +1,342 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file batch_som.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Batch and mini-batch SOM training with msom parameters.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# batch and mini-batch SOM training with msom parameters.
+#
+# the "msom" operator updates the weights one pixel at a time. here a
+# batch of pixels is labelled against fixed weights with one matrix
+# multiply (see bmu.py), the per-neuron sums and counts of the batch are
+# spread over the grid with the neighborhood function, and all neurons
+# are moved at once, so the work is a few BLAS calls per batch and uses
+# every core.
+#
+# batch_size > 0 (mini-batch): a neuron with neighborhood weighted
+# count n moves toward the weighted mean of its batch by
+# 1 - (1-rate)^n, where n online steps of size rate toward the same
+# mean would take it. sigma and rate decay over the batches.
+# batch_size 0 (batch map): each epoch sets every neuron to the
+# neighborhood weighted mean of all the data; sigma decays per epoch
+# and rate is not used.
+#
+# the grid, pca initialization, gaussian neighborhood, hexagonal
+# topology and errors follow minisom, on which msom is built, and the
+# result is written as a .labels file like msom writes.
+
+batch_som_copyright = 'batch_som.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+import math
+import datetime
+
+import numpy as np
+
+from somfile import write_labels
+from bmu import find_BMUs, nearest_neurons
+
+# -------------------------------------------------------------
+
+# decay of x (sigma or rate) at step t of T; msom decay_function codes.
+# train_msom.py uses 3
+def decay( x, t, T, function ):
+
+    if function == 1:                   # asymptotic
+        return x/(1.0 + t/(T/2.0))
+    if function == 2:                   # linear to zero
+        return x*(1.0 - t/T)
+    if function == 3:                   # inverse to zero, C = T/100
+        return x/(1.0 + 100.0*t/T)
+
+    raise RuntimeError( 'batch_som: unknown decay function ' +
+                        str( function ) )
+
+# grid coordinates (nneurons,2) of a shape[0] x shape[1] map, neuron
+# i*shape[1]+j at (i,j). as in minisom, hexagonal maps shift every
+# other row (counted from the last) half a cell; rows are sqrt(3)/2
+# apart so all six neighbors are at distance 1
+def grid_coords( shape, topology ):
+
+    m, n = shape
+    xx, yy = np.meshgrid( np.arange( m, dtype=np.float64 ),
+                          np.arange( n, dtype=np.float64 ) )   # (n,m)
+    if topology == 'hexagonal':
+        xx[::-2] -= 0.5
+        yy *= math.sqrt( 3 )/2
+    elif topology != 'rectangular':
+        raise RuntimeError( 'batch_som: unknown topology ' + str(topology) )
+
+    return np.stack( (xx.T.ravel(),yy.T.ravel()), axis=1 )
+
+# (nneurons,nneurons) neighborhood weights for sigma
+def neighborhood( coords, sigma, function ):
+
+    d2 = ( (coords[:,None,:] - coords[None,:,:])**2 ).sum( axis=2 )
+
+    if function == 'gaussian':
+        sigma = max( sigma, 1e-6 )
+        return np.exp( -d2/(2*sigma*sigma) )
+    if function == 'bubble':
+        return ( d2 <= sigma*sigma ).astype( np.float64 )
+
+    raise RuntimeError( 'batch_som: unknown neighborhood function ' +
+                        str( function ) )
+
+class params():
+    pass
+
+class batch_som():
+    def __init__( self, name ):
+
+        self.name = name
+        self.source = None
+
+        # same parameters as the msom operator, plus batch_size
+        p = self.params = params()
+        p.shape = (5,5)
+        p.sigma = 1.0
+        p.nepochs = 1
+        p.rate = 0.5
+        p.show_progress = False
+        p.init_weights = 'pca'
+        p.neighborhood_function = 'gaussian'
+        p.topology = 'hexagonal'
+        p.activation_distance = 'euclidean'
+        p.output_type = 'labels'
+        p.mapfile_prefix = 'som'
+        p.apply_classification = False
+        p.apply_activation = False
+        p.rorder = True
+        p.seed = None
+        p.custom_init_file = None
+        p.decay_function = 3
+        p.batch_size = 16384     # pixels per update; 0 for batch map
+
+        self.weights = None      # (nneurons,ndim) after run()
+        self.qe = None
+        self.te = None
+
+    # train on source (ny,nx,ndim) and write mapfile_prefix.labels
+    def run( self ):
+
+        p = self.params
+        if p.activation_distance != 'euclidean':
+            raise RuntimeError( 'batch_som: only euclidean activation '
+                                'distance is implemented' )
+
+        # an unset seed is drawn and recorded so the run can be repeated
+        if p.seed == None:
+            p.seed = int( np.random.SeedSequence().entropy % 2**32 )
+        rng = np.random.default_rng( p.seed )
+
+        data = self.source
+        ny, nx, ndim = data.shape
+        coords = grid_coords( p.shape, p.topology )
+
+        if p.custom_init_file != None:
+            weights = np.load( p.custom_init_file ).reshape( (-1,ndim) )
+            weights = weights.astype( np.float64 )
+        elif p.init_weights == 'pca':
+            weights = self.pca_init( data, rng )
+        elif p.init_weights == 'random':
+            rows = rng.integers( 0, ny, len(coords) )
+            cols = rng.integers( 0, nx, len(coords) )
+            weights = data[rows,cols].astype( np.float64 )
+        else:
+            raise RuntimeError( 'batch_som: unknown init ' +
+                                str( p.init_weights ) )
+
+        if p.batch_size > 0:
+            weights = self.train_minibatch( data, weights, coords, rng )
+        else:
+            weights = self.train_batch( data, weights, coords )
+
+        self.weights = weights.astype( np.float32 )
+        self.qe, self.te = map_errors( data, self.weights, coords,
+                                       p.topology )
+
+        if p.output_type == 'labels':
+            self.write( p.mapfile_prefix + '.labels' )
+
+    # weights spanning the first two principal components of a pixel
+    # sample, around its mean (minisom spans them around zero)
+    def pca_init( self, data, rng, nsample=100000 ):
+
+        p = self.params
+        ny, nx, ndim = data.shape
+
+        rows = np.sort( rng.integers( 0, ny, max( 1, nsample//nx ) ) )
+        sample = data[rows].reshape( (-1,ndim) ).astype( np.float64 )
+
+        values, vectors = np.linalg.eigh( np.cov( sample, rowvar=False ) )
+        pc0 = vectors[:,-1]
+        pc1 = vectors[:,-2]
+
+        m, n = p.shape
+        c1 = np.linspace( -1, 1, m ).repeat( n )
+        c2 = np.tile( np.linspace( -1, 1, n ), m )
+
+        return sample.mean( axis=0 ) + c1[:,None]*pc0 + c2[:,None]*pc1
+
+    # per-neuron sums and counts of a (npix,ndim) batch
+    def batch_sums( self, x, weights ):
+
+        w = weights.astype( np.float32 )
+        bmus = find_BMUs( w, x[None], metric='euclidean' )[0]
+
+        nneurons = len( weights )
+        onehot = np.zeros( (len(x),nneurons), dtype=np.float32 )
+        onehot[np.arange( len(x) ),bmus] = 1
+
+        sums = ( onehot.T @ x ).astype( np.float64 )
+        counts = np.bincount( bmus, minlength=nneurons ).astype( np.float64 )
+
+        return sums, counts
+
+    def train_minibatch( self, data, weights, coords, rng ):
+
+        p = self.params
+        ny, nx, ndim = data.shape
+
+        # batches are made of whole rows, taken in random order
+        nrows = max( 1, p.batch_size//nx )
+        nbatches = (ny + nrows - 1)//nrows
+        T = p.nepochs*nbatches
+
+        t = 0
+        for epoch in range( p.nepochs ):
+            order = rng.permutation( ny ) if p.rorder else np.arange( ny )
+
+            for b in range( nbatches ):
+                rows = np.sort( order[b*nrows:(b+1)*nrows] )
+                x = np.ascontiguousarray( data[rows], dtype=np.float32 )
+                x = x.reshape( (-1,ndim) )
+
+                sigma = decay( p.sigma, t, T, p.decay_function )
+                rate = decay( p.rate, t, T, p.decay_function )
+                h = neighborhood( coords, sigma, p.neighborhood_function )
+
+                sums, counts = self.batch_sums( x, weights )
+                num = h @ sums
+                den = h @ counts
+
+                used = den > 0
+                alpha = 1.0 - np.power( 1.0 - rate, den[used] )
+                target = num[used]/den[used][:,None]
+                weights[used] += alpha[:,None]*( target - weights[used] )
+
+                t += 1
+
+            if p.show_progress:
+                print( 'epoch', epoch+1, 'of', p.nepochs, file=sys.stderr,
+                       flush=True )
+
+        return weights
+
+    def train_batch( self, data, weights, coords, nrows=64 ):
+
+        p = self.params
+        ny, nx, ndim = data.shape
+
+        for epoch in range( p.nepochs ):
+            sigma = decay( p.sigma, epoch, p.nepochs, p.decay_function )
+            h = neighborhood( coords, sigma, p.neighborhood_function )
+
+            sums = np.zeros( weights.shape, dtype=np.float64 )
+            counts = np.zeros( len(weights), dtype=np.float64 )
+            for j in range( 0, ny, nrows ):
+                x = np.ascontiguousarray( data[j:j+nrows], dtype=np.float32 )
+                s, c = self.batch_sums( x.reshape( (-1,ndim) ), weights )
+                sums += s
+                counts += c
+
+            num = h @ sums
+            den = h @ counts
+            used = den > 0
+            weights[used] = num[used]/den[used][:,None]
+
+            if p.show_progress:
+                print( 'epoch', epoch+1, 'of', p.nepochs, file=sys.stderr,
+                       flush=True )
+
+        return weights
+
+    # the .labels file, with the header keys msom writes
+    def write( self, labelsfile ):
+
+        p = self.params
+        header = { 'timestamp': datetime.datetime.now().isoformat(),
+                   'shape': tuple( p.shape ),
+                   'sigma': p.sigma,
+                   'nepochs': p.nepochs,
+                   'rate': p.rate,
+                   'neighborhood function': p.neighborhood_function,
+                   'init weights': p.init_weights,
+                   'topology': p.topology,
+                   'activation distance': p.activation_distance,
+                   'output type': p.output_type,
+                   'mapfile_prefix': p.mapfile_prefix,
+                   'apply classification': p.apply_classification,
+                   'apply activation': p.apply_activation,
+                   'seed': p.seed,
+                   'random order': p.rorder,
+                   'custom init file': p.custom_init_file,
+                   'decay_function': p.decay_function,
+                   'training': 'minibatch' if p.batch_size > 0 else 'batch',
+                   'batch size': p.batch_size,
+                   'quantization error': np.float32( self.qe ),
+                   'topographic error': np.float32( self.te ) }
+
+        write_labels( labelsfile, header, self.weights )
+
+# end class batch_som
+
+# quantization error (mean distance to the best matching unit) and
+# topographic error (fraction of pixels whose two best units are not
+# grid neighbors) of weights over data, in row blocks
+def map_errors( data, weights, coords, topology, nrows=64 ):
+
+    ny, nx, ndim = data.shape
+    w = weights.astype( np.float32 )
+
+    # grid neighbors are at distance 1 (hexagonal) or up to the
+    # diagonal (rectangular), as minisom counts them
+    reach = 1.0 + 1e-6 if topology == 'hexagonal' else 1.42
+
+    qsum = 0.0
+    nerrors = 0
+    for j in range( 0, ny, nrows ):
+        x = np.ascontiguousarray( data[j:j+nrows], dtype=np.float32 )
+        x = x.reshape( (-1,ndim) )
+
+        best2, d2 = nearest_neurons( w, x, 2 )
+        qsum += np.sqrt( d2[:,0] ).sum()
+
+        gap = np.linalg.norm( coords[best2[:,0]] - coords[best2[:,1]], axis=1 )
+        nerrors += int( ( gap > reach ).sum() )
+
+    npix = ny*nx
+
+    return qsum/npix, nerrors/npix
@@ -0,0 +1,72 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file bench_bmu.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Time per-pixel find_BMU against block-wise find_BMUs on synthetic data.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# time per-pixel find_BMU against block-wise find_BMUs on synthetic data.
+# the per-pixel loop is timed on a few rows and scaled to the full day.
+
+bench_bmu_copyright = 'bench_bmu.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath(__file__) ), '..' ) )
+from bmu import find_BMU, find_BMUs
+
+ny = 171          # one day of the WRF grid
+nx = 171
+ndim = 192        # 24 hours x 8 variables
+nneurons = 25     # 5x5 SOM
+nloop = 4         # rows to time with the per-pixel loop
+
+rng = np.random.default_rng( 1 )
+data = rng.random( (ny,nx,ndim), dtype=np.float32 )
+neurons = rng.random( (nneurons,ndim), dtype=np.float32 )
+
+# ----------------------------------------------------------------
+
+start = time.perf_counter()
+ref = np.empty( (nloop,nx), dtype=np.uint8 )
+for j in range( nloop ):
+    for i in range( nx ):
+        ref[j,i] = find_BMU( nneurons, neurons, data[j,i,:] )
+loop_time = (time.perf_counter() - start)*ny/nloop
+
+start = time.perf_counter()
+labels = find_BMUs( neurons, data )
+block_time = time.perf_counter() - start
+
+if not np.array_equal( ref, labels[:nloop] ):
+    print( 'bench_bmu: labels do not match...exiting', file=sys.stderr )
+    sys.exit( 1 )
+
+print( 'pixels per day:      ', ny*nx )
+print( 'find_BMU  (per pixel): %.3f s/day (estimated)'%loop_time )
+print( 'find_BMUs (blocked):   %.3f s/day'%block_time )
+print( 'speedup:               %.1fx'%(loop_time/block_time) )
@@ -0,0 +1,103 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file bench_features.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Compare np.append growth with the preallocated feature cube for one day.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# compare np.append growth with the preallocated feature cube for one day.
+# reports time, bytes copied and peak traced memory per day.
+
+bench_features_copyright = 'bench_features.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath(__file__) ), '..' ) )
+from features import feature_cube
+
+ny = 171
+nx = 171
+nvars = 8
+nhours = 24
+ndays = 10        # days to average over
+
+rng = np.random.default_rng( 1 )
+hourly = [ rng.random( (ny,nx,nvars), dtype=np.float32 )
+           for i in range( nhours ) ]
+
+# ----------------------------------------------------------------
+
+def append_day():
+    for i in range( nhours ):
+        if i == 0:
+            aug = hourly[i]
+        else:
+            aug = np.append( aug, hourly[i], axis=2 )
+    return aug
+
+def cube_day():
+    cube = feature_cube( ny, nx, nhours, nvars )
+    for i in range( nhours ):
+        cube.put_hour( i, hourly[i] )
+    return cube.buf
+
+# time per day and peak traced memory while building one day
+def measure( day ):
+
+    start = time.perf_counter()
+    for k in range( ndays ):
+        out = day()
+    elapsed = (time.perf_counter() - start)/ndays
+
+    tracemalloc.start()
+    out = day()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return out, elapsed, peak
+
+ref, t_append, peak_append = measure( append_day )
+out, t_cube, peak_cube = measure( cube_day )
+
+if not np.array_equal( ref, out ):
+    print( 'bench_features: feature cubes do not match...exiting',
+           file=sys.stderr )
+    sys.exit( 1 )
+
+# bytes copied: np.append copies the growing cube every hour
+hour_bytes = ny*nx*nvars*4
+copied_append = sum( (i+1)*hour_bytes for i in range( 1, nhours ) )
+copied_cube = nhours*hour_bytes
+
+mb = 1024*1024
+print( 'day cube size:         %.1f MB'%(nhours*hour_bytes/mb) )
+print( 'np.append:    %.4f s/day  %7.1f MB copied  %6.1f MB peak'%
+       (t_append, copied_append/mb, peak_append/mb) )
+print( 'feature_cube: %.4f s/day  %7.1f MB copied  %6.1f MB peak'%
+       (t_cube, copied_cube/mb, peak_cube/mb) )
+print( 'speedup:      %.1fx'%(t_append/t_cube) )
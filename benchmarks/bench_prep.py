@@ -0,0 +1,128 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file bench_prep.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Time hourly against whole-day preparation of the ETo variables.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# time hourly against whole-day preparation of the ETo variables on a
+# synthetic day of raw WRF bands. the hourly path gives the operator
+# a 20 band two-slice stack 24 times, as collect_data.py did before
+# single_pass; the day path converts the 25 slices once (eto_prep.py).
+# the prep_eto operator is timed over the same hours and the day
+# kernel is checked against it; the benchmark fails when prep_eto is
+# not installed or the outputs differ, since the hourly path above
+# only checks the kernel against itself.
+
+bench_prep_copyright = 'bench_prep.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath(__file__) ), '..' ) )
+from eto_prep import eto_prep, prep_day
+
+ny = 171          # one day of the WRF grid
+nx = 171
+ntimes = 25
+albedo = 0.23
+nrepeat = 3       # best of
+rtol = 1e-4       # allowed difference to prep_eto (np.allclose)
+atol = 1e-5
+
+# raw bands in plausible ranges: TSK EMISS SWDOWN GLW GRDFLX T2 PSFC
+# Q2 U10 V10
+low = np.array( [270, 0.90, 0, 250, -100, 265, 55000, 0.002, -15, -15],
+                dtype=np.float32 )
+high = np.array( [320, 1.00, 1100, 450, 200, 310, 102000, 0.020, 15, 15],
+                 dtype=np.float32 )
+
+rng = np.random.default_rng( 1 )
+block = low + ( high - low )*rng.random( (ny,nx,ntimes,10),
+                                         dtype=np.float32 )
+
+# ----------------------------------------------------------------
+
+# the 24 calls of the hourly path; slices i and i+1 side by side
+def hourly( op ):
+
+    out = np.empty( (ny,nx,ntimes-1,8), dtype=np.float32 )
+    for i in range( ntimes-1 ):
+        op.source = np.concatenate( (block[:,:,i,:],block[:,:,i+1,:]),
+                                    axis=2 )
+        op.run()
+        out[:,:,i,:] = op.sink[:,:,:8]
+
+    return out
+
+def best( f ):
+
+    t = None
+    for r in range( nrepeat ):
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        if t == None or elapsed < t:
+            t = elapsed
+
+    return t, result
+
+op = eto_prep( 'eto_prep' )
+op.params.albedo = albedo
+
+hourly_time, ref = best( lambda: hourly( op ) )
+
+out = np.empty( (ny,nx,ntimes-1,8), dtype=np.float32 )
+day_time, hours = best( lambda: prep_day( block, albedo, out ) )
+
+diff = np.abs( hours - ref ).max()
+
+print( 'hours per day:         ', ntimes-1 )
+print( 'hourly (24 calls):      %.3f s/day'%hourly_time )
+print( 'day kernel (1 call):    %.3f s/day'%day_time )
+print( 'speedup:                %.1fx'%(hourly_time/day_time) )
+print( 'hourly vs day kernel:   %g max abs difference (eto_prep only)'%diff )
+
+try:
+    from prep_eto_pack import prep_eto
+except ImportError:
+    print( 'prep_eto operator not installed, the day kernel is unvalidated' )
+    sys.exit( 1 )
+
+pe = prep_eto.prep_eto( 'prep_eto' )
+pe.params.albedo = albedo
+pe_time, pe_ref = best( lambda: hourly( pe ) )
+
+print( 'prep_eto (24 calls):    %.3f s/day'%pe_time )
+print( 'speedup over prep_eto:  %.1fx'%(pe_time/day_time) )
+print( 'max abs difference per variable:',
+       ' '.join( '%g'%d for d in np.abs( hours - pe_ref ).max( axis=(0,1,2) ) ) )
+
+if not np.allclose( hours, pe_ref, rtol=rtol, atol=atol ):
+    print( 'day kernel does not match prep_eto' )
+    sys.exit( 1 )
+
+print( 'day kernel matches prep_eto; validated can be set in eto_prep.py' )
@@ -0,0 +1,108 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file check_single_pass.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Check single pass day features against the hourly wrf_source path.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# check the single pass read of collect_data.py and apply_class.py
+# against the hourly path on a real wrfout file. the hourly path has
+# the "wrf_source" operator read two slices per hour and "prep_eto"
+# prepare them; the single pass path reads the file once (see
+# wrf_block.py, which assumes the row orientation of wrf_source) and
+# prepares all hours side by side in one "prep_eto" call (which
+# assumes prep_eto works pixel by pixel). both feature cubes must be
+# equal within float32 rounding. the check fails when it cannot run,
+# since single_pass stays unvalidated until it passes.
+
+check_single_pass_copyright = 'check_single_pass.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath(__file__) ), '..' ) )
+
+albedo = 0.23     # match collect_data.py
+nvars = 8         # number of ETo input actual variables
+rtol = 1e-5       # allowed difference of the feature cubes
+atol = 1e-6
+
+# template band string of collect_data.py; 'ts' is the time slice
+bandstr = 'TSK:ts,EMISS:ts,SWDOWN:ts,GLW:ts,GRDFLX:ts,T2:ts,PSFC:ts,Q2:ts,U10:ts,V10:ts'
+
+# ----------------------------------------------------------------
+
+if len( sys.argv ) != 2:
+    print( 'usage: check_single_pass.py wrfout_file' )
+    print( 'single_pass unvalidated, not checked' )
+    sys.exit( 1 )
+
+wrffile = sys.argv[1]
+if not os.path.exists( wrffile ):
+    print( 'check_single_pass:', wrffile, 'does not exist...exiting' )
+    sys.exit( 1 )
+
+try:
+    from prep_eto_pack import prep_eto
+    from wrf_source_pack import wrf_source
+    import netCDF4
+except ImportError as e:
+    print( e )
+    print( 'single_pass unvalidated, not checked' )
+    sys.exit( 1 )
+
+import wrf_block
+from features import day_features
+
+src = wrf_source.wrf_source( 'wrf_source' )
+prep = prep_eto.prep_eto( 'prep_eto' )
+prep.params.albedo = albedo
+
+hourly = day_features( wrffile, src, prep, bandstr, nvars,
+                       single_pass=False ).buf.copy()
+single = day_features( wrffile, src, prep, bandstr, nvars,
+                       single_pass=True ).buf.copy()
+
+if hourly.shape != single.shape:
+    print( 'feature cube shapes differ:', hourly.shape, single.shape )
+    sys.exit( 1 )
+
+diff = np.abs( hourly.astype( np.float64 ) - single )
+diff = diff.reshape( hourly.shape[:2] + (24,nvars) ).max( axis=(0,1,2) )
+print( 'max abs difference per variable:',
+       ' '.join( '%g'%d for d in diff ) )
+
+if np.allclose( hourly, single, rtol=rtol, atol=atol ):
+    print( 'single pass features match the hourly path' )
+    sys.exit( 0 )
+
+# tell a row orientation mismatch from other differences
+if np.allclose( hourly, single[::-1], rtol=rtol, atol=atol ):
+    print( 'single pass rows are flipped; set flipud in wrf_block.py to',
+           not wrf_block.flipud )
+else:
+    print( 'single pass features differ from the hourly path' )
+
+sys.exit( 1 )
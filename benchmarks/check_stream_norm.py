@@ -0,0 +1,150 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file check_stream_norm.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Check streaming normalization against the norm operator.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# check the two-pass streaming normalization of collect_data.py
+# (see stream_norm.py) against the in-memory path on a few synthetic
+# days: the days are appended and normalized by the "norm" operator,
+# then the same days are run through stream_norm and the "cnorm"
+# operator. the coefficients files must be identical and the
+# normalized arrays equal within float32 rounding. the check fails
+# when the operators are not installed, since stream_norm.write_coeffs
+# relies on how norm treats skip and writes its coefficients file.
+
+check_stream_norm_copyright = 'check_stream_norm.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath(__file__) ), '..' ) )
+from stream_norm import stream_norm
+
+try:
+    from norm_pack import norm
+    from cnorm_pack import cnorm
+    from append_pack import append
+except ImportError:
+    print( 'norm, cnorm or append operator not installed, '
+           'streaming normalization is unvalidated' )
+    sys.exit( 1 )
+
+ny = 57           # one tile of the WRF grid per day
+nx = 57
+nvars = 8         # interlaced ETo variables
+nhours = 24
+ndays = 4
+chunkdays = 3     # cnorm rows per call, not a multiple of ndays
+rtol = 1e-6       # allowed difference of the normalized arrays
+atol = 1e-6
+
+# days with a different range per variable, hour-major interlace
+rng = np.random.default_rng( 1 )
+low = rng.uniform( -100, 100, nvars ).astype( np.float32 )
+span = rng.uniform( 0.01, 1000, nvars ).astype( np.float32 )
+days = [ np.tile( low, nhours ) +
+         np.tile( span, nhours )*rng.random( (ny,nx,nhours*nvars),
+                                             dtype=np.float32 )
+         for d in range( ndays ) ]
+
+tmpdir = tempfile.mkdtemp( prefix='check_stream_norm_' )
+normfile = os.path.join( tmpdir, 'norm.coeffs' )
+streamfile = os.path.join( tmpdir, 'stream.coeffs' )
+
+# ----------------------------------------------------------------
+
+# in memory: append the days, one norm run over all of them
+app = append.append( 'append' )
+for day in days:
+    app.source = day
+    app.run()
+
+nrm = norm.norm( 'norm' )
+nrm.params.ntype = 0
+nrm.params.skip = nvars
+nrm.params.write = True
+nrm.params.filepath = normfile
+nrm.source = app.sink
+nrm.run()
+ref = np.asarray( nrm.sink )
+
+# streaming: running extremes per day, coefficients, then cnorm in place
+snrm = stream_norm( nvars )
+out = np.empty( (ndays*ny,nx,nhours*nvars), dtype=np.float32 )
+for d, day in enumerate( days ):
+    out[d*ny:(d+1)*ny] = day
+    snrm.update( day )
+
+snrm_op = norm.norm( 'norm' )
+snrm_op.params.ntype = 0
+snrm_op.params.skip = nvars
+snrm_op.params.write = True
+snrm_op.params.filepath = streamfile
+snrm.write_coeffs( snrm_op, nhours*nvars )
+
+cnrm = cnorm.cnorm( 'cnorm' )
+cnrm.params.clip = False
+cnrm.params.filepath = streamfile
+snrm.apply( cnrm, out, chunkdays*ny )
+
+# ----------------------------------------------------------------
+
+failed = False
+
+f = open( normfile, 'rb' )
+norm_coeffs = f.read()
+f.close()
+f = open( streamfile, 'rb' )
+stream_coeffs = f.read()
+f.close()
+
+if norm_coeffs != stream_coeffs:
+    print( 'coefficients files differ:', normfile, streamfile )
+    failed = True
+else:
+    print( 'coefficients files identical' )
+
+if ref.shape != out.shape:
+    print( 'normalized shapes differ:', ref.shape, out.shape )
+    failed = True
+else:
+    diff = np.abs( ref.astype( np.float64 ) - out ).max()
+    print( 'max abs difference:  %g'%diff )
+    if not np.allclose( ref, out, rtol=rtol, atol=atol ):
+        print( 'normalized arrays differ' )
+        failed = True
+
+if failed:
+    print( 'files kept in', tmpdir )
+    sys.exit( 1 )
+
+os.remove( normfile )
+os.remove( streamfile )
+os.rmdir( tmpdir )
+
+print( 'streaming normalization matches the norm operator' )
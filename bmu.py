@@ -0,0 +1,198 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file bmu.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Find best matching units (BMUs) for whole data arrays against SOM weights.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# find best matching units (BMUs) for whole data arrays against SOM weights
+
+bmu_copyright = 'bmu.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import numpy as np
+
+# -------------------------------------------------------------
+
+# single sample version; kept as the reference for find_BMUs
+def find_BMU( num, neurons, sample ):
+
+    # just find the closest vector
+
+    # initialize
+    diff = sample - neurons[0]
+    diff = np.abs( diff )
+    min_dist = np.sum( diff, axis=0 )
+    label = 0
+
+    for i in range(1,num):
+        diff = sample - neurons[i]
+        diff = np.abs( diff )
+        tmp = np.sum( diff, axis=0 )
+        if tmp < min_dist:
+            min_dist = tmp
+            label = i
+
+    return label
+
+# label all pixels of data (ny,nx,ndim) against neurons (nneurons,ndim).
+# the data is processed in blocks of nrows rows so memory stays bounded.
+#
+# metric 'l1': labels are identical to calling find_BMU on every pixel;
+# distances are reduced over the same contiguous axis in the same dtype,
+# and ties go to the lowest neuron index.
+#
+# metric 'euclidean': labels are the neurons nearest in exact (float64)
+# squared distance, ties to the lowest neuron index; see
+# nearest_neurons.
+def find_BMUs( neurons, data, nrows=64, metric='l1' ):
+
+    nneurons, ndim = neurons.shape
+    ny, nx, ndim_data = data.shape
+    if ndim != ndim_data:
+        raise RuntimeError( 'find_BMUs: vector dimensions are mismatched' )
+
+    dtype = np.result_type( data.dtype, neurons.dtype )
+    neurons = neurons.astype( dtype, copy=False )
+
+    labels = np.empty( (ny,nx), dtype=np.uint8 if nneurons <= 256
+                       else np.int32 )
+
+    if metric == 'euclidean':
+        euclidean_BMUs( neurons, data, nrows, labels )
+        return labels
+    elif metric != 'l1':
+        raise RuntimeError( 'find_BMUs: unknown metric ' + str(metric) )
+
+    # work buffers, reused for every block
+    nrows = max( 1, min( nrows, ny ) )
+    diff = np.empty( (nrows,nx,ndim), dtype=dtype )
+    dist = np.empty( (nrows,nx), dtype=dtype )
+    min_dist = np.empty( (nrows,nx), dtype=dtype )
+    closer = np.empty( (nrows,nx), dtype=bool )
+
+    for j in range( 0, ny, nrows ):
+        n = min( nrows, ny-j )
+        block = data[j:j+n]
+
+        d = diff[:n]
+        np.subtract( block, neurons[0], out=d )
+        np.abs( d, out=d )
+        np.sum( d, axis=2, out=min_dist[:n] )
+        lab = labels[j:j+n]
+        lab[:] = 0
+
+        for i in range( 1, nneurons ):
+            np.subtract( block, neurons[i], out=d )
+            np.abs( d, out=d )
+            np.sum( d, axis=2, out=dist[:n] )
+
+            # strictly less keeps the first neuron on ties
+            np.less( dist[:n], min_dist[:n], out=closer[:n] )
+            np.copyto( min_dist[:n], dist[:n], where=closer[:n] )
+            lab[closer[:n]] = i
+
+    return labels
+
+# the nbest nearest neurons (nneurons,ndim) of every row of x (npix,ndim)
+# in euclidean distance, nearest first: indices (npix,nbest) and exact
+# squared distances (npix,nbest), float64.
+#
+# candidates come from the expansion |w|^2 - 2 x.w (+ |x|^2, the same
+# for all neurons), one matrix multiply in the data dtype, with x and w
+# taken about the mean neuron to keep the norms small. its rounding
+# error is bounded by tol below; rows where any of the nbest+1 nearest
+# candidates are closer together than tol could be ordered wrongly and
+# are recomputed directly in float64 against all neurons. the result is
+# the same as sorting the float64 distances (x - w)^2 of every neuron,
+# ties to the lowest neuron index.
+def nearest_neurons( neurons, x, nbest=1 ):
+
+    nneurons, ndim = neurons.shape
+    npix = x.shape[0]
+    nbest = min( nbest, nneurons )
+    k = min( nbest+1, nneurons )
+
+    dtype = np.result_type( x.dtype, neurons.dtype )
+    neurons = neurons.astype( dtype, copy=False )
+
+    # distances do not change with the origin
+    center = neurons.mean( axis=0 )
+    wc = neurons - center
+    xc = x - center
+    wnorm = np.sum( wc*wc, axis=1 )
+
+    dist = xc @ wc.T                    # (npix,nneurons)
+    dist *= -2
+    dist += wnorm
+
+    # candidates: the k smallest in order, taken out one at a time
+    cand = np.empty( (npix,k), dtype=np.intp )
+    cdist = np.empty( (npix,k), dtype=dist.dtype )
+    pix = np.arange( npix )
+    for c in range( k ):
+        cand[:,c] = np.argmin( dist, axis=1 )
+        cdist[:,c] = dist[pix,cand[:,c]]
+        dist[pix,cand[:,c]] = np.inf
+
+    # bound on the difference of two expanded distances, centering included
+    xnorm = np.einsum( 'ij,ij->i', xc, xc, dtype=np.float64 )
+    tol = 4*( ndim+2 )*np.finfo( dtype ).eps*( xnorm + float( wnorm.max() ) )
+
+    # exact distances of the candidates
+    x64 = x.astype( np.float64, copy=False )
+    w64 = neurons.astype( np.float64 )
+    index = np.ascontiguousarray( cand[:,:nbest] )
+    d2 = np.empty( (npix,nbest), dtype=np.float64 )
+    for b in range( nbest ):
+        diff = x64 - w64[index[:,b]]
+        np.einsum( 'ij,ij->i', diff, diff, out=d2[:,b] )
+
+    # near ties among the candidates are sorted out exactly
+    if k > 1:
+        near = np.any( np.diff( cdist, axis=1 ) <= tol[:,None], axis=1 )
+    else:
+        near = np.zeros( npix, dtype=bool )
+
+    rows = np.flatnonzero( near )
+    step = max( 1, 2**20//( nneurons*ndim ) )
+    for r in range( 0, len( rows ), step ):
+        rr = rows[r:r+step]
+        diff = x64[rr,None,:] - w64
+        exact = np.einsum( 'ijk,ijk->ij', diff, diff )
+        best = np.argsort( exact, axis=1, kind='stable' )[:,:nbest]
+        index[rr] = best
+        d2[rr] = np.take_along_axis( exact, best, axis=1 )
+
+    return index, d2
+
+# euclidean version of find_BMUs, filling labels
+def euclidean_BMUs( neurons, data, nrows, labels ):
+
+    ny, nx, ndim = data.shape
+
+    for j in range( 0, ny, nrows ):
+        n = min( nrows, ny-j )
+        x = np.ascontiguousarray( data[j:j+n] ).reshape( (n*nx,ndim) )
+
+        index, d2 = nearest_neurons( neurons, x )
+        labels[j:j+n] = index[:,0].reshape( (n,nx) )
@@ -0,0 +1,296 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file class_stats.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Per-class daily statistics of a per-pixel quantity.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# per-class daily statistics of a per-pixel quantity.
+#
+# the daily labels of "apply_class.py" (ny,nx,ndays) group the pixels
+# of each day by class. a per-pixel daily quantity is reduced over
+# each (day, class) group with weighted np.bincount calls over the
+# flat day*nclasses + class index, chunkdays days at a time, giving a
+# (ndays,nclasses,nstats) table with the stats
+#   fraction   share of the day's pixels in the class
+#   count      pixels in the class with a finite value
+#   mean       mean of the values
+#   variance   variance of the values (about the mean, two pass)
+# classes absent on a day have mean and variance NaN.
+#
+# the quantity is either a daily ETo grid written by eto_grid.py
+# (ndays,ny,nx), or the daily (24 hour) mean of one of the 8 variables
+# of a raw feature store (see store_append.py). a raw store keeps the
+# days un-normalized, so the means are in the units of the variable;
+# collected .npy files and normalized stores are scaled to 0..1 and
+# are refused.
+
+class_stats_copyright = 'class_stats.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+import getopt
+
+import numpy as np
+
+from npyfile import load_npy
+from feature_store import date_index, is_store, feature_store
+
+stats = ( 'fraction', 'count', 'mean', 'variance' )
+
+# prepared variables, in cube order (see eto_prep.py)
+varnames = ( 'Rn', 'G', 'T', 'D', 'g', 'es', 'ea', 'u2' )
+
+# -------------------------------------------------------------
+
+# (ndays,nclasses,nstats) table of labels (ny,nx,ndays) and values
+# (ndays,ny,nx) for the same days
+def group_stats( labels, values, nclasses ):
+
+    ny, nx, ndays = labels.shape
+    ngroups = ndays*nclasses
+
+    lab = np.moveaxis( labels, 2, 0 ).reshape( -1 ).astype( np.int64 )
+    if lab.size and ( lab.min() < 0 or lab.max() >= nclasses ):
+        raise RuntimeError( 'class_stats: labels outside 0..%d'%
+                            (nclasses-1) )
+
+    # flat group index day*nclasses + class
+    group = np.repeat( np.arange( ndays, dtype=np.int64 )*nclasses, ny*nx )
+    group += lab
+
+    v = np.asarray( values, dtype=np.float64 ).reshape( -1 )
+    finite = np.isfinite( v )
+    if not finite.all():
+        group_v = group[finite]
+        v = v[finite]
+    else:
+        group_v = group
+
+    npix = np.bincount( group, minlength=ngroups )
+    count = np.bincount( group_v, minlength=ngroups )
+    total = np.bincount( group_v, weights=v, minlength=ngroups )
+
+    table = np.empty( (ngroups,len(stats)), dtype=np.float64 )
+    table[:,0] = npix/float( ny*nx )
+    table[:,1] = count
+
+    with np.errstate( invalid='ignore', divide='ignore' ):
+        mean = total/count
+        dev = v - mean[group_v]
+        table[:,2] = mean
+        table[:,3] = np.bincount( group_v, weights=dev*dev,
+                                  minlength=ngroups )/count
+
+    return table.reshape( (ndays,nclasses,len(stats)) )
+
+# daily values (nd,ny,nx) of days k..k+nd-1: an ETo grid (3d) as is,
+# a raw feature store as variable var's daily mean of the given dates
+def day_values( source, k, nd, var=None, dates=None ):
+
+    if var == None:
+        return source[k:k+nd]
+
+    ny, nx = source.ny, source.nx
+    days = np.empty( (nd,ny,nx,source.nbands), dtype=source.dtype )
+    for j in range( nd ):
+        source.read_day( dates[k+j], (0,ny,0,nx), days[j] )
+
+    return days[:,:,:,var::source.nvars].mean( axis=3, dtype=np.float64 )
+
+# the raw store holding the un-normalized days for variable statistics,
+# and the dates of the labelled days: those of the dates file if given,
+# else all days of the store
+def raw_days( valuesfile, ndays, datesfile=None ):
+
+    if not is_store( valuesfile ):
+        raise RuntimeError( 'class_stats: ' + valuesfile + ' is not a '
+                            'feature store; variable statistics need the '
+                            'un-normalized days of a raw store' )
+
+    store = feature_store( valuesfile )
+    if not store.raw:
+        raise RuntimeError( 'class_stats: ' + valuesfile + ' holds '
+                            'normalized days; variable statistics need a '
+                            'raw store' )
+
+    if datesfile != None:
+        dates = [ date for date, f in date_index( datesfile ) ]
+        missing = set( dates ) - set( store.dates() )
+        if len( missing ) > 0:
+            raise RuntimeError( 'class_stats: ' + valuesfile + ' lacks ' +
+                                min( missing ) + ' and %d other days'%
+                                (len(missing)-1) )
+    else:
+        dates = store.dates()
+
+    if len( dates ) != ndays:
+        raise RuntimeError( 'class_stats: %d days of '%len( dates ) +
+                            valuesfile + ' for %d labelled days'%ndays )
+
+    return store, dates
+
+# statistics table of a labels file against a values file, chunkdays
+# days at a time; see day_values for var and raw_days for datesfile
+def class_stats( labelsfile, valuesfile, nclasses, var=None, chunkdays=32,
+                 datesfile=None ):
+
+    labels = load_npy( labelsfile )
+    ny, nx, ndays = labels.shape
+
+    dates = None
+    if var == None:
+        source = load_npy( valuesfile )
+        fits = source.shape == (ndays,ny,nx)
+    else:
+        source, dates = raw_days( valuesfile, ndays, datesfile )
+        fits = (source.ny,source.nx) == (ny,nx)
+    if not fits:
+        raise RuntimeError( 'class_stats: ' + valuesfile + ' does not '
+                            'match the %d days of '%ndays + labelsfile )
+
+    table = np.empty( (ndays,nclasses,len(stats)), dtype=np.float64 )
+    for k in range( 0, ndays, chunkdays ):
+        nd = min( chunkdays, ndays-k )
+        table[k:k+nd] = group_stats( labels[:,:,k:k+nd],
+                                     day_values( source, k, nd, var, dates ),
+                                     nclasses )
+
+    return table
+
+# write the table as .npy, or as .csv with one line per day and class;
+# the day column is the date when the dates file is given (and its
+# files are dated wrfout names), else the day number
+def write_stats( outfile, table, datesfile=None ):
+
+    if not outfile.endswith( '.csv' ):
+        np.save( outfile, table.astype( np.float32 ) )
+        return
+
+    ndays, nclasses = table.shape[:2]
+    days = [ str(k) for k in range( ndays ) ]
+    if datesfile != None:
+        try:
+            days = [ date for date, f in date_index( datesfile ) ]
+        except RuntimeError as e:
+            print( e, '(numbering days instead)', file=sys.stderr )
+            days = [ str(k) for k in range( ndays ) ]
+        if len( days ) != ndays:
+            raise RuntimeError( 'class_stats: ' + datesfile + ' does not '
+                                'list %d days'%ndays )
+
+    csv = open( outfile, 'w' )
+    csv.write( 'day,class,' + ','.join( stats ) + '\n' )
+    for k in range( ndays ):
+        for c in range( nclasses ):
+            fraction, count, mean, variance = table[k,c]
+            csv.write( '%s,%d,%.6f,%d,%.6g,%.6g\n'%(days[k],c,fraction,
+                                                    count,mean,variance) )
+    csv.close()
+
+def usage():
+        print( 'usage: class_stats.py', file=sys.stderr )
+        print( '       -h, --help', file=sys.stderr )
+        print( '       -l labelsfile, --labels=labelsfile', file=sys.stderr )
+        print( '       -v valuesfile, --values=valuesfile', file=sys.stderr )
+        print( '       -c nclasses, --classes=nclasses', file=sys.stderr )
+        print( '       -j var, --var=var (values from a raw store; ' +
+               ','.join( varnames ) + ' or 0-7)', file=sys.stderr )
+        print( '       -d datesfile, --dates=datesfile', file=sys.stderr )
+        print( '       -o outfile, --out=outfile (.csv or .npy)',
+               file=sys.stderr )
+        print( '       -k chunkdays, --chunk=chunkdays', file=sys.stderr )
+
+def get_params( argv ):
+    labelsfile = None
+    valuesfile = None
+    nclasses = 25
+    var = None
+    datesfile = None
+    outfile = None
+    chunkdays = 32
+
+    try:
+        opts, args = getopt.getopt( argv, 'hl:v:c:j:d:o:k:',
+                                    ['help','labels=','values=','classes=',
+                                     'var=','dates=','out=','chunk='] )
+
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt in ( '-h', '--help' ):
+            usage()
+            sys.exit(0)
+        elif opt in ( '-l', '--labels' ):
+            labelsfile = arg
+        elif opt in ( '-v', '--values' ):
+            valuesfile = arg
+        elif opt in ( '-c', '--classes' ):
+            nclasses = int( arg )
+        elif opt in ( '-j', '--var' ):
+            if arg in varnames:
+                var = varnames.index( arg )
+            else:
+                var = int( arg )
+        elif opt in ( '-d', '--dates' ):
+            datesfile = arg
+        elif opt in ( '-o', '--out' ):
+            outfile = arg
+        elif opt in ( '-k', '--chunk' ):
+            chunkdays = int( arg )
+        else:
+            usage()
+            sys.exit(1)
+
+    if labelsfile == None:
+        print( 'class_stats: labels file is missing...exiting' )
+        sys.exit(1)
+    if valuesfile == None:
+        print( 'class_stats: values file is missing...exiting' )
+        sys.exit(1)
+    if outfile == None:
+        print( 'class_stats: output file is missing...exiting' )
+        sys.exit(1)
+
+    return labelsfile, valuesfile, nclasses, var, datesfile, outfile, \
+           chunkdays
+
+####################################################################
+# command line user entry point
+####################################################################
+if __name__ == '__main__':
+
+    labelsf,valuesf,nclasses,var,datesf,outf,chunkdays = \
+        get_params( sys.argv[1:] )
+
+    try:
+        table = class_stats( labelsf, valuesf, nclasses, var, chunkdays,
+                             datesf )
+        write_stats( outf, table, datesf )
+    except RuntimeError as e:
+        print( e, '...exiting', file=sys.stderr )
+        sys.exit( 1 )
+
+    print( 'wrote', table.shape, 'table of', ','.join( stats ), 'to', outf,
+           file=sys.stderr )
@@ -37,10 +37,22 @@ import getopt
 import numpy as np
 
 from norm_pack import norm
+from cnorm_pack import cnorm
 from append_pack import append
 from prep_eto_pack import prep_eto
 from wrf_source_pack import wrf_source
 
+from eto_prep import eto_prep, validated as eto_prep_validated
+from day_pool import extract_days
+from feature_cache import feature_cache
+from features import day_features, read_datafiles
+from stream_norm import stream_norm
+from npyfile import load_npy
+from feature_store import is_store, feature_store, create_store, wrf_date
+from store_append import append_days
+from eto_grid import eto_writer
+from prefetch import day_reader
+
 # point to data files 
 datapath = './dates/jan-mar_2019.txt'  # point to WRF output data
 outpath = './jan-mar_2019.npy'
@@ -48,7 +60,22 @@ outpath = './jan-mar_2019.npy'
 # instantiate the operators
 src = wrf_source.wrf_source( 'wrf_source' )
 
-prep = prep_eto.prep_eto( 'prep_eto' )
+# prepare the ETo variables with the vectorized float32 kernel of
+# eto_prep.py (a whole day per call, each time slice once) instead of
+# the prep_eto operator. held back until the kernel is shown to match
+# prep_eto (benchmarks/bench_prep.py, then validated in eto_prep.py);
+# it changes the features and days get their own feature cache keys
+vector_prep = False
+
+if vector_prep and not eto_prep_validated:
+    print( 'collect_data: eto_prep.py is not validated against prep_eto '
+           '(see benchmarks/bench_prep.py)...exiting', file=sys.stderr )
+    sys.exit( 1 )
+
+if vector_prep:
+    prep = eto_prep( 'eto_prep' )
+else:
+    prep = prep_eto.prep_eto( 'prep_eto' )
 prep.params.albedo = 0.23
 
 nvars = 8                # number of ETo input actual variables
@@ -63,20 +90,120 @@ nrm.params.filepath = './jan-mar_2019.coeffs' # output normalization coeffs
 # appends a set of buffers (array) to another set
 app = append.append( 'append' ) 
 
+# read each wrfout file once (all 25 time slices) and prepare the 24
+# hours in one "prep_eto" call. False uses the wrf_source operator hour
+# by hour. unvalidated: the row orientation and prep_eto over hours laid
+# side by side have not been checked against wrf_source; it stays off
+# until benchmarks/check_single_pass.py passes on a real wrfout file
+single_pass = False
+
+# write each day straight into a memory mapped .npy file sized from the
+# dates file instead of keeping all days in memory with the append
+# operator. set to False to append in memory and dump at the end.
+# unvalidated: the two-pass normalization (stream_norm.py) relies on
+# how norm treats skip and writes its coefficients; leave it off until
+# benchmarks/check_stream_norm.py passes with the operators installed
+streaming = False
+
+# keep un-normalized daily feature cubes in cachedir so days prepared
+# before (same wrfout file, band string and albedo) are not read and
+# prepared again. least recently used days are removed past cachemax
+# bytes. None turns the cache off.
+cachedir = None                # eg. '/datax/eto_cache/'
+cachemax = 200*1024**3         # 200 GB; about 9000 days
+
+# number of worker processes extracting days in parallel; each day is
+# written into its own rows of the streaming output, so more than one
+# worker needs streaming set
+nworkers = 1
+
+# read up to prefetch days ahead in a background thread while earlier
+# days are prepared (single_pass only, one worker). a summary of read
+# and wait times is printed at the end to size it; 0 turns it off.
+prefetch = 2
+
+# streaming mode normalizes in two passes: running min/max as days are
+# produced, then cnorm over the output, chunkdays days at a time
+snrm = stream_norm( nvars )
+chunkdays = 4
+
+cnrm = cnorm.cnorm( 'cnorm' )
+cnrm.params.clip = False
+cnrm.params.filepath = nrm.params.filepath  # coeffs written by nrm
+
+# also keep the collected (normalized) days in a chunked feature store
+# (see feature_store.py) for date range and pixel window reads. the
+# store records the coefficients file; a store already holding days
+# (normalized by another run) is refused. None skips the store.
+storepath = None               # eg. '/datax/eto_store/'
+
+# incremental mode: only days of the dates file missing from storepath
+# are prepared and added, un-normalized, to a raw store (see
+# store_append.py); the running min/max and the store's coefficients
+# file are updated and readers normalize on the fly. no outpath file is
+# written. needs storepath. the coefficients are written as in
+# streaming mode and are unvalidated as well.
+incremental = False
+
+# also write reference ETo grids (see eto_grid.py), computed from the
+# prepared days before normalization: <etoprefix>_daily.npy (mm/day)
+# and, with eto_hourly, <etoprefix>_hourly.npy (mm/hour). not written
+# in incremental mode. None skips them.
+etoprefix = None               # eg. './jan-mar_2019_eto'
+eto_hourly = True
+
 # ----------------------------------------------------------------------------
 # main
 
 # augment raw variables with time series 
 
-datafiles = open( datapath )
+datafiles = read_datafiles( datapath )
+ndays = len( datafiles )
+
+if nworkers > 1 and not streaming:
+    print( 'collect_data: more than one worker needs streaming...exiting',
+           file=sys.stderr )
+    sys.exit( 1 )
 
 # check if data files exist
 for f in datafiles:
-    if not os.path.isfile( f.strip() ):
+    if not os.path.isfile( f ):
         print( 'collect_data:', f, ' does not exist...exiting',
                file=sys.stderr )
         sys.exit( 1 )
-datafiles.seek( 0, 0 )  # rewind
+
+# the store indexes days by the dates in the wrfout file names
+if storepath != None:
+    for f in datafiles:
+        try:
+            wrf_date( f )
+        except RuntimeError as e:
+            print( 'collect_data:', e, '...exiting', file=sys.stderr )
+            sys.exit( 1 )
+
+if incremental and storepath == None:
+    print( 'collect_data: incremental mode needs storepath...exiting',
+           file=sys.stderr )
+    sys.exit( 1 )
+
+if incremental and etoprefix != None:
+    print( 'collect_data: ETo grids are not written in incremental '
+           'mode...exiting', file=sys.stderr )
+    sys.exit( 1 )
+
+# collected days are normalized, a raw store only takes incremental days.
+# each collection is normalized with its own coefficients, so its days
+# cannot join the days of another collection
+if not incremental and storepath != None and is_store( storepath ):
+    if feature_store( storepath ).raw:
+        print( 'collect_data:', storepath, 'is a raw store, use incremental '
+               'mode...exiting', file=sys.stderr )
+        sys.exit( 1 )
+    if len( feature_store( storepath ).dates() ) > 0:
+        print( 'collect_data:', storepath, 'holds days normalized with other '
+               'coefficients; use a new store or incremental mode...exiting',
+               file=sys.stderr )
+        sys.exit( 1 )
 
 # NOTE: time slice 11 corresponds to 12:00pm Ecuador time
 #       time slice  0 corresponds to 01:00am Ecuador time
@@ -86,71 +213,128 @@ datafiles.seek( 0, 0 )  # rewind
 # band string indicates which bands get extracted from WRF source file
 bandstr = 'TSK:ts,EMISS:ts,SWDOWN:ts,GLW:ts,GRDFLX:ts,T2:ts,PSFC:ts,Q2:ts,U10:ts,V10:ts'
 
-for f in datafiles:
-    
+if cachedir != None:
+    cache = feature_cache( cachedir, cachemax )
+else:
+    cache = None
+
+# add new days to the store and stop
+if incremental:
+    try:
+        append_days( storepath, datafiles, src, prep, bandstr, nvars, nrm,
+                     single_pass, cache, prefetch )
+    except RuntimeError as e:
+        print( 'collect_data:', e, '...exiting', file=sys.stderr )
+        sys.exit( 1 )
+    sys.exit( 0 )
+
+# with a worker pool the first day is done here to size the output,
+# the rest are extracted in parallel straight into the output file
+if nworkers > 1:
+    ndays_here = 1
+else:
+    ndays_here = ndays
+
+reader = day_reader( datafiles[:ndays_here], bandstr, prefetch, single_pass,
+                     cache, prep, nvars )
+
+for k in range( ndays_here ):
+
+    f = datafiles[k]
+    block = cached = None
+    if reader != None:
+        f, block, cached = next( reader )
     print( 'processing ', f, file=sys.stderr )
-    f = f.strip()  # remove white spaces
-
-    # run through hourly slices to augment feature space
-
-    # read two slices and average actual values over the day
-    # NOTE: should be using spin-up values  
-    for i in range(0,24):
-
-        # construct wrf_source band string, replace 'ts' with first time slice value
-        bstr = bandstr.replace('ts','%02d'%i )
-        
-        # second time slice is added to string          
-        # if operator "prep_eto" sees 10 bands it will implement directly
-        # if operator "prep_eto" sees 20 bands it will implement two sets
-        # and return an average
-        
-        # tell the source operator to get both time slices        
-        src.params.bandstr = bstr + ',' + bandstr.replace('ts','%02d'%(i+1) )
-
-        # read the file with specifird bands (above) to extract
-        src.params.filepath = f
-        src.run()
-
-        # process raw variables to get actual input values for Penman-Montieth
-        prep.source = src.sink
-        prep.run()
-                                              
-        # time slice variable augmentation to feature space
-        # implicitly introduces diurnal weather influences over time
-        if i == 0: # value needs to be same as start i
-            aug = prep.sink
-        else:
-            aug = np.append( aug, prep.sink, axis=2 )
-                         
-        ''' same thing done manually                
-        for j in range( nvars ):
-            aug[:,:,((i-1)*nvars + j)] = prep.sink[:,:,j]
-        '''
-        print( '.', end='', file=sys.stderr, flush=True )
-
-    print( '\n', file=sys.stderr, flush=True )
-    
-    # link augmented output to append operator input and run
-    # to get daily series
-    app.source = aug
-    app.run()
-
-datafiles.close()
-
-# use line below for non-normalized data; comment out normalization below
-#app.sink.dump( outpath )
-
-#''' Normalize entire span of data (hourly and daily)
-print( 'normalizing...', file=sys.stderr, flush=True, end='' )
-nrm.source = app.sink # link append output to normalize input and run
-nrm.run()
-print( 'done', file=sys.stderr, flush=True )
-
-# save as numpy file
-print( 'writing to file...', file=sys.stderr, flush=True, end='' )
-nrm.sink.dump( outpath, protocol=4 )
-print( 'done', file=sys.stderr, flush=True )
+
+    # time slice variable augmentation to feature space
+    # implicitly introduces diurnal weather influences over time.
+    # a new cube per day; the append operator keeps the old ones
+    cube = day_features( f, src, prep, bandstr, nvars, single_pass,
+                         cache=cache, block=block, cached=cached )
+    ny, nx = cube.buf.shape[:2]
+
+    # reference ETo while the prepared day is at hand
+    if etoprefix != None:
+        if k == 0:
+            eto = eto_writer( etoprefix, ndays, ny, nx, eto_hourly )
+        eto.put( k, cube.hours )
+
+    if streaming:
+
+        # days are stacked along y, as the append operator does
+        if k == 0:
+            out = np.lib.format.open_memmap( outpath, mode='w+',
+                                             dtype=cube.buf.dtype,
+                                             shape=(ndays*ny,nx,24*nvars) )
+        out[k*ny:(k+1)*ny] = cube.buf
+        snrm.update( cube.buf )
+        del cube
+
+    else:
+        # link augmented output to append operator input and run
+        # to get daily series
+        app.source = cube.buf
+        app.run()
+
+if reader != None:
+    reader.report()
+
+if nworkers > 1:
+    out.flush()
+    print( 'extracting', ndays-1, 'days with', nworkers, 'workers',
+           file=sys.stderr, flush=True )
+    done = extract_days( datafiles[1:], outpath, 1, nworkers,
+                         prep.params.albedo, bandstr, nvars, single_pass,
+                         cachedir, cachemax, vector_prep )
+    for k, vmin, vmax in done:
+        snrm.merge( vmin, vmax )
+
+    # reference ETo of the extracted days, before they are normalized
+    if etoprefix != None:
+        eto.put_days( 1, out[ny:], nvars )
+
+if etoprefix != None:
+    eto.close()
+    print( 'ETo grids written to ' + etoprefix + '_*.npy', file=sys.stderr,
+           flush=True )
+
+if streaming:
+    out.flush()
+
+    # normalize entire span of data (hourly and daily) in place
+    print( 'normalizing...', file=sys.stderr, flush=True, end='' )
+    snrm.write_coeffs( nrm, 24*nvars )
+    snrm.apply( cnrm, out, chunkdays*ny )
+    out.flush()
+    del out
+    print( 'done', file=sys.stderr, flush=True )
+
+else:
+    # use line below for non-normalized data; comment out normalization below
+    #np.save( outpath, app.sink )
+
+    #''' Normalize entire span of data (hourly and daily)
+    print( 'normalizing...', file=sys.stderr, flush=True, end='' )
+    nrm.source = app.sink # link append output to normalize input and run
+    nrm.run()
+    print( 'done', file=sys.stderr, flush=True )
+
+    # save as numpy (.npy) file, readers can memory map it
+    print( 'writing to file...', file=sys.stderr, flush=True, end='' )
+    np.save( outpath, nrm.sink )
+    print( 'done', file=sys.stderr, flush=True )
+
+if storepath != None:
+    print( 'writing to store ' + storepath + '...', file=sys.stderr,
+           flush=True, end='' )
+    data = load_npy( outpath )
+    if is_store( storepath ):
+        fstore = feature_store( storepath )
+    else:
+        fstore = create_store( storepath, ny, nx, 24*nvars, dtype=data.dtype )
+    fstore.put_days( datafiles, data, nrm.params.filepath )
+    del data
+    print( 'done', file=sys.stderr, flush=True )
 
 '''
 # get max and min values for each variable and its position
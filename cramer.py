@@ -32,73 +32,127 @@ cramer_copyright = 'cramer.py Copyright (c) 2020-2022 Scott L. Williams, release
 import os
 import sys
 import getopt
-import math
+import hashlib
 import numpy as np
 
-from npy_source_pack import npy_source
+from bmu import find_BMUs
+from somfile import load_som
+from feature_store import is_store, read_features, selection_tag
+from feature_store import parse_window
+from cvstats import contingency, class_lut, write_lut, marginals, cramer_v
+from cvstats import sample_index, cv_interval
 
 # -------------------------------------------------------------
 
-# read a som file for weights
+# read a som file for weights, text .labels or binary .som
+# (see somfile.py)
 def readsom( somfile ):
 
-    wfile = open( somfile, 'r' ) 
-
     print( 'reading ', somfile, file=sys.stderr)
-    
-    # print header and look for flag
-    found = False
-    for line in wfile:
-        if line.find( 'NEURONS' ) != -1:
-            found = True
-            break
-        print( line.strip(), file=sys.stderr )
-                
-    if not found:
-        print( 'cramer:could not find flag...exiting', file=sys.stderr )
+
+    try:
+        header, neurons = load_som( somfile )
+    except RuntimeError as e:
+        print( 'cramer:', e, '...exiting', file=sys.stderr )
         sys.exit( 1 )
-                
-    nneurons,ndim = wfile.readline().split()
-    nneurons = int( nneurons )
-    ndim = int( ndim )
 
-    # get the neuron weights
-    
-    # allocate buffer
-    neurons = np.empty( (nneurons,ndim), dtype=np.float32 )
+    return neurons
 
-    # retrieve neurons from file
-    for i in range( nneurons):            
-        line = wfile.readline().split()    # get line components:
-        
-        for j in range( 1, ndim+1 ):       # skip grey level label
-            neurons[i,j-1] = float( line[j] )
-            
-    wfile.close()
+# read the training data, memory mapped if it is a .npy file
+# (see npyfile.py). a feature store (see feature_store.py) can be read
+# for a date range (start to end, 'YYYY-MM-DD') and a pixel window
+# (y0,y1,x0,x1)
+def read_data( datafile, start=None, end=None, window=None ):
 
-    return neurons
+    print( 'reading datafile: ' + datafile + '...',
+           file=sys.stderr, flush=True, end='' )
+    try:
+        data = read_features( datafile, start, end, window )
+    except RuntimeError as e:
+        print( '\ncramer:', e, '...exiting', file=sys.stderr )
+        sys.exit( 1 )
+    print( 'done', file=sys.stderr, flush=True )
 
-def find_BMU( num, neurons, sample ):
+    return data
 
-    # just find the closest vector
+# content hash of a file, used to key cached label maps
+def file_hash( path, blocksize=1<<24 ):
 
-    # initialize
-    diff = sample - neurons[0]
-    diff = np.abs( diff )
-    min_dist = np.sum( diff, axis=0 )
-    label = 0
-    
-    for i in range(1,num):
-        diff = sample - neurons[i]
-        diff = np.abs( diff )
-        tmp = np.sum( diff, axis=0 )
-        if tmp < min_dist:
-            min_dist = tmp
-            label = i
+    h = hashlib.sha1()
+    with open( path, 'rb' ) as f:
+        block = f.read( blocksize )
+        while block:
+            h.update( block )
+            block = f.read( blocksize )
+
+    return h.hexdigest()
+
+# content hash of a datafile; a feature store is identified by its
+# metadata, which changes with every stored day, and the selection
+def data_hash( datafile, start=None, end=None, window=None ):
+
+    if is_store( datafile ):
+        h = hashlib.sha1( file_hash( os.path.join( datafile, 'meta.json' ) )
+                          .encode() )
+        h.update( selection_tag( start, end, window ).encode() )
+        return h.hexdigest()
+
+    return file_hash( datafile )
+
+# cached label map filename for a som file and datafile hash
+def labels_path( somfile, cachedir, datahash ):
+    return os.path.join( cachedir, file_hash( somfile ) + '_' +
+                         datahash + '.npy' )
+
+# label the data with a SOM. if cachedir is given the label map is
+# kept on disk keyed by the som file hash and the datafile hash so
+# the labelling is done only once per SOM and data set.
+def som_labels( somfile, data, cachedir=None, datahash=None ):
 
-    return label
+    som = readsom( somfile )
+    nlabels, ndim_som = som.shape
 
-def cramer( datafile, som1file, som2file, lutfile ):
+    # check if vector dimensions match
+    ny, nx, ndim_data = data.shape
+    if ndim_som != ndim_data:
+        print( 'cramer: vector dimensions are mismatched...exiting',
+               file=sys.stderr )
+        sys.exit( 2 )
+
+    cachefile = None
+    if cachedir != None:
+        cachefile = labels_path( somfile, cachedir, datahash )
+        if os.path.isfile( cachefile ):
+            print( 'using cached labels: ' + cachefile, file=sys.stderr,
+                   flush=True )
+            return np.load( cachefile ), nlabels
+
+    print( 'labelling...', file=sys.stderr, end='', flush=True )
+    labels = find_BMUs( som, data )
+    print( 'done', file=sys.stderr, flush=True )
+
+    if cachefile != None:
+        np.save( cachefile, labels )
+
+    return labels, nlabels
+
+# labels of the pixels at flat indices index of data (ny,nx,ndim)
+def sampled_labels( som, data, index ):
+
+    ndim = data.shape[2]
+    sample = data.reshape( (-1,ndim) )[index]
+
+    return find_BMUs( som, sample.reshape( (-1,1,ndim) ), nrows=4096 )[:,0]
+
+# with nsamples > 0 cramer-v and the lut are estimated from a sample of
+# about nsamples pixels (see cvstats.sample_index), random or spatially
+# stratified, drawn with the given seed. with nboot > 0 a bootstrap
+# confidence interval of the estimate is reported.
+# a feature store datafile is read for dates start to end and the pixel
+# window (y0,y1,x0,x1) given (see read_data).
+def cramer( datafile, som1file, som2file, lutfile, nsamples=0,
+            stratified=False, seed=0, nboot=0, start=None, end=None,
+            window=None ):
     
     # get the soms
     som1 = readsom( som1file )
@@ -110,16 +164,7 @@ def cramer( datafile, som1file, som2file, lutfile ):
         sys.exit( 1 )
     
     # get the training data
-    src = npy_source.npy_source( 'npy_source' )
-    src.params.filepath = datafile
-
-    print( 'reading datafile: ' + src.params.filepath + '...',
-           file=sys.stderr, flush=True, end='' )
-    src.run()
-    print( 'done', file=sys.stderr, flush=True )
-
-    data = src.sink
-    ny,nx,ndim = data.shape
+    data = read_data( datafile, start, end, window )
 
     # check if vector dimensions match
     nlabels, ndim_som = som1.shape
@@ -129,122 +174,80 @@ def cramer( datafile, som1file, som2file, lutfile ):
                file=sys.stderr )
         sys.exit( 2 )
 
-    # allocate observable matrix and set to zero
-    obs = [[0 for i in range(nlabels)] for j in range(nlabels)]
+    if nsamples > 0:
 
-    # construct observable matrix
-    print( 'constructing observable matrix...',
-           file=sys.stderr, end='', flush=True )
+        # label only the sampled pixels
+        index = sample_index( ny, nx, nsamples, stratified, seed )
+        labels1 = sampled_labels( som1, data, index )
+        labels2 = sampled_labels( som2, data, index )
 
-    # assign first SOM to be columns (x), second SOM to be rows (y)
-    for j in range( ny ):
-        for i in range( nx ):
-            label1 = find_BMU( nlabels, som1, data[j,i,:] )
-            label2 = find_BMU( nlabels, som2, data[j,i,:] )
-            obs[label2][label1] += 1
+        Cv, lower, upper = cramer_sample( labels1, labels2, nlabels,
+                                          lutfile, nboot, seed )
+        if nboot > 0:
+            print( 'cramer: %d pixel sample, 95%% interval %.4f - %.4f'%
+                   (index.size, lower, upper), file=sys.stderr, flush=True )
+        return Cv
 
-    print( 'done', file=sys.stderr, flush=True )
+    # label every pixel for both SOMs in row blocks
+    labels1 = find_BMUs( som1, data )
+    labels2 = find_BMUs( som2, data )
 
-    '''
-    for j in range( nlabels ):
-        print( obs[j], file=sys.stderr, flush=True )
-    '''
+    return cramer_labels( labels1, labels2, nlabels, lutfile,
+                          som1file, som2file )
 
-    # create a class to class mapping (LUT) SOM1 labels to SOM2 labels
-    # for later application in similarity measures
-    if lutfile != None:
-        print( 'creating lut...', file=sys.stderr, flush=True, end='')
+# cramer-v estimate from sampled label maps and its 95% bootstrap
+# interval (nboot resamples; the interval is (Cv,Cv) if nboot is 0).
+# a label missing from the sample is not an error here.
+def cramer_sample( labels1, labels2, nlabels, lutfile, nboot=200, seed=0 ):
 
-        lut = [0 for i in range( nlabels ) ]
-        
-        # brute force
-        for i in range( nlabels ):
-            
-            # find maximum for this column
-            maxc = -math.inf
-            for j in range( nlabels ):
-                if obs[j][i] > maxc:
-                    maxc = obs[j][i]
-                    ij = j
-            lut[i] = ij
-
-        lfile = open( lutfile, 'w' )
-        for i in range( nlabels-1 ):
-            lfile.write( str(lut[i]) + ',' )
-        lfile.write( str(lut[i+1]) + '\n' )
-        lfile.close()
+    obs = contingency( labels1, labels2, nlabels )
 
-        print( 'done', file=sys.stderr, flush=True )
-            
-    # construct vectors/matrices
-    Ni = [0 for i in range(nlabels)]
-    for i in range(nlabels):
-        Ni[i] = 0
-        for j in range(nlabels):
-            Ni[i] += obs[j][i]
-        
-        if Ni[i] == 0:
-            print( 'cramer: error...Ni element at', i, ' is zero' )
-            print( 'an unused label is indicated in file ' + som1file )
-            print( 'try reducing number of classes in training...exiting.' )
-            sys.exit(0)
-        
-    # get sum of vector
-    sum_ni = 0
-    for i in range(nlabels):
-        sum_ni += Ni[i]
-
-    Nj = [0 for i in range(nlabels)]
-    for j in range(nlabels):
-        Nj[j] = 0
-        for i in range(nlabels):
-            Nj[j] += obs[j][i]
-        
-        if Nj[j] == 0:
-            print( 'cramer: error...Nj element at', i, ' is zero' )
-            print( 'an unused label is indicated in file ' + som2file )
-            print( 'try reducing number of classes in training...exiting.' )
-            sys.exit(0)
+    if lutfile != None:
+        write_lut( lutfile, class_lut( obs ) )
 
-    # get sum of vector
-    sum_nj = 0
-    for j in range(nlabels):
-        sum_nj += Nj[j]
+    Cv = cramer_v( obs )
+    if nboot == 0:
+        return Cv, Cv, Cv
 
-    if sum_nj != sum_ni:
-        print( 'cramer: sums do not match...exiting', file=sys.stderr )
-        sys.exit( 1 )
+    lower, upper = cv_interval( obs, nboot, 0.95, seed )
 
-    ntotal = nx*ny    # total number of pixels
+    return Cv, lower, upper
 
-    if sum_nj != ntotal:
-        print( 'cramer: sample sums do not match...exiting', file=sys.stderr )
-        sys.exit( 1 )
+# cramer-v value (and optional lut) from two label maps of the same data
+def cramer_labels( labels1, labels2, nlabels, lutfile,
+                   som1file='first som', som2file='second som' ):
 
-    # calculate expected values
-    expected = [[0 for i in range(nlabels)] for j in range(nlabels)]
-    for j in range( nlabels ):
-        for i in range( nlabels ):
-            expected[j][i] = (Nj[j] * Ni[i])/ntotal
-
-    # calculate chi squared
-    chisq = [[0 for i in range(nlabels)] for j in range(nlabels)]
-    for j in range( nlabels ):
-        for i in range( nlabels ):
-            chisq[j][i] = ((obs[j][i]-expected[j][i])**2)/expected[j][i]
+    # construct observable matrix
+    print( 'constructing observable matrix...',
+           file=sys.stderr, end='', flush=True )
 
-    # calculate cramer-v
+    # assign first SOM to be columns (x), second SOM to be rows (y)
+    obs = contingency( labels1, labels2, nlabels )
 
-    # numerator
-    sum_chisq = 0.0
-    for j in range( nlabels ):
-        for i in range( nlabels ):
-            sum_chisq += chisq[j][i]
+    print( 'done', file=sys.stderr, flush=True )
 
-    # denominator
-    denominator = ntotal*(nlabels-1)
+    # create a class to class mapping (LUT) SOM1 labels to SOM2 labels
+    # for later application in similarity measures
+    if lutfile != None:
+        print( 'creating lut...', file=sys.stderr, flush=True, end='')
+        write_lut( lutfile, class_lut( obs ) )
+        print( 'done', file=sys.stderr, flush=True )
 
-    Cv = math.sqrt( sum_chisq/denominator )
+    # every label must be used by both soms
+    Ni, Nj = marginals( obs )
+    for i in np.flatnonzero( Ni == 0 )[:1]:
+        print( 'cramer: error...Ni element at', i, ' is zero' )
+        print( 'an unused label is indicated in file ' + som1file )
+        print( 'try reducing number of classes in training...exiting.' )
+        sys.exit(0)
+
+    for j in np.flatnonzero( Nj == 0 )[:1]:
+        print( 'cramer: error...Nj element at', j, ' is zero' )
+        print( 'an unused label is indicated in file ' + som2file )
+        print( 'try reducing number of classes in training...exiting.' )
+        sys.exit(0)
+
+    Cv = cramer_v( obs )
     print( 'cramer-v done', file=sys.stderr, flush=True )
 
     return Cv
@@ -259,16 +262,33 @@ def usage( self ):
         print( '       -f somfile, --first=somfile',file=sys.stderr )
         print( '       -s somfile, --second=somfile',file=sys.stderr )
         print( '       -l lutfile, --lut=lutfile',file=sys.stderr )
+        print( '       -n nsamples, --samples=nsamples',file=sys.stderr )
+        print( '       -t, --stratified',file=sys.stderr )
+        print( '       -r seed, --seed=seed',file=sys.stderr )
+        print( '       -b nboot, --bootstrap=nboot',file=sys.stderr )
+        print( '       --start=YYYY-MM-DD --end=YYYY-MM-DD (feature store)',
+               file=sys.stderr )
+        print( '       --window=y0,y1,x0,x1 (feature store)',file=sys.stderr )
 
 def get_params( argv ):
     datafile = None
     som1file = None
     som2file = None
     lutfile = None
+    nsamples = 0
+    stratified = False
+    seed = 0
+    nboot = 200
+    start = None
+    end = None
+    window = None
         
     try:                                
-        opts, args = getopt.getopt( argv, 'hd:f:s:l:',
-                                    ['help','data=','first=','second=','lut='] )
+        opts, args = getopt.getopt( argv, 'hd:f:s:l:n:tr:b:',
+                                    ['help','data=','first=','second=','lut=',
+                                     'samples=','stratified','seed=',
+                                     'bootstrap=','start=','end=',
+                                     'window='] )
             
     except getopt.GetoptError:           
         self.usage()                          
@@ -286,6 +306,20 @@ def get_params( argv ):
             som2file = arg
         elif opt in ( '-l', '--lut' ):
             lutfile = arg
+        elif opt in ( '-n', '--samples' ):
+            nsamples = int( arg )
+        elif opt in ( '-t', '--stratified' ):
+            stratified = True
+        elif opt in ( '-r', '--seed' ):
+            seed = int( arg )
+        elif opt in ( '-b', '--bootstrap' ):
+            nboot = int( arg )
+        elif opt == '--start':
+            start = arg
+        elif opt == '--end':
+            end = arg
+        elif opt == '--window':
+            window = parse_window( arg )
         else:
             self.usage()                     
             sys.exit(1)
@@ -300,14 +334,17 @@ def get_params( argv ):
         print( 'cramer: second somfile is missing...exiting' )
         sys.exit(1)
 
-    return datafile, som1file, som2file, lutfile
+    return datafile, som1file, som2file, lutfile, nsamples, stratified, \
+           seed, nboot, start, end, window
 
 ####################################################################
 # command line user entry point 
 ####################################################################
 if __name__ == '__main__':  
 
-    dataf,som1f,som2f,lutf = get_params( sys.argv[1:] )
+    dataf,som1f,som2f,lutf,nsamples,strat,seed,nboot,start,end,window = \
+        get_params( sys.argv[1:] )
 
-    Cv = cramer( dataf, som1f, som2f, lutf )
+    Cv = cramer( dataf, som1f, som2f, lutf, nsamples, strat, seed, nboot,
+                 start, end, window )
     print( 'Cramer value =', Cv )
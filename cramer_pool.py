@@ -0,0 +1,130 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file cramer_pool.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Compare a set of SOMs pairwise with Cramer-V over a process pool.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# compare a set of SOMs pairwise with Cramer-V over a process pool.
+# workers share the training data through a read-only memory map of a
+# .npy file and exchange label maps through the label cache directory,
+# so no large arrays are pickled between processes. results come back
+# in pair order, independent of the number of workers.
+
+cramer_pool_copyright = 'cramer_pool.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from npyfile import npy_path
+from cramer import cramer_labels, som_labels, labels_path, data_hash
+from feature_store import is_store, store_npy
+
+# -------------------------------------------------------------
+
+# per worker memory map of the training data
+_data = None
+
+def init_worker( npypath ):
+    global _data
+    _data = np.load( npypath, mmap_mode='r' )
+
+# label the data with one SOM; the label map lands in the cache
+def label_worker( somfile, labeldir, datahash ):
+
+    labels, nlabels = som_labels( somfile, _data, labeldir, datahash )
+
+    return labels_path( somfile, labeldir, datahash ), nlabels
+
+# cramer-v for one pair of cached label maps
+def pair_worker( job ):
+
+    path1, path2, nlabels, lutfile, som1file, som2file = job
+
+    labels1 = np.load( path1, mmap_mode='r' )
+    labels2 = np.load( path2, mmap_mode='r' )
+
+    return cramer_labels( labels1, labels2, nlabels, lutfile,
+                          som1file, som2file )
+
+# cramer-v for every (j,i,lutfile) pair of somset, in pair order
+# (with a feature store as datafile, over dates start to end and a
+# pixel window)
+def cramer_matrix( datafile, somset, pairs, labeldir, nworkers,
+                   start=None, end=None, window=None ):
+
+    if not os.path.isdir( labeldir ):
+        os.mkdir( labeldir )
+
+    nsoms = len( somset )
+
+    # mappable copy of the data and its cache key
+    if is_store( datafile ):
+        npypath = store_npy( datafile, labeldir, start, end, window )
+    else:
+        npypath = npy_path( datafile, labeldir )
+
+    print( 'hashing datafile...', file=sys.stderr, end='', flush=True )
+    datahash = data_hash( datafile, start, end, window )
+    print( 'done', file=sys.stderr, flush=True )
+
+    with ProcessPoolExecutor( max_workers=nworkers, initializer=init_worker,
+                              initargs=(npypath,) ) as pool:
+
+        # label each som once
+        print( 'labelling', nsoms, 'soms with', nworkers, 'workers',
+               file=sys.stderr, flush=True )
+        labelled = list( pool.map( label_worker, somset,
+                                   [labeldir]*nsoms, [datahash]*nsoms ) )
+
+        nlabels = labelled[0][1]
+        for i in range( nsoms ):
+            if labelled[i][1] != nlabels:
+                print( 'cramer_pool: som maps do have same shape...exiting',
+                       file=sys.stderr )
+                sys.exit( 1 )
+
+        # then score the pairs
+        jobs = []
+        for j, i, lutfile in pairs:
+            jobs.append( (labelled[j][0], labelled[i][0], nlabels, lutfile,
+                          somset[j], somset[i]) )
+
+        cvs = list( pool.map( pair_worker, jobs ) )
+
+    return cvs
+
+# write the full symmetric similarity matrix as text; the som files
+# are listed as comments in row order
+def write_matrix( matrixfile, somset, matrix ):
+
+    mfile = open( matrixfile, 'w' )
+    for i in range( len(somset) ):
+        mfile.write( '# %d '%i + somset[i] + '\n' )
+
+    for j in range( len(somset) ):
+        mfile.write( ' '.join( '%.4f'%v for v in matrix[j] ) + '\n' )
+    mfile.close()
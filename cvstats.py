@@ -0,0 +1,139 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file cvstats.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Contingency table, class LUT and Cramer-V statistics from label arrays.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# contingency table, class LUT and Cramer-V statistics from label arrays.
+# the first label array gives the columns (x), the second the rows (y),
+# as in cramer.py.
+#
+# for quick sweeps Cramer-V can be estimated from a pixel sample
+# (sample_index) with a bootstrap confidence interval (cv_interval).
+
+cvstats_copyright = 'cvstats.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import math
+import numpy as np
+
+# -------------------------------------------------------------
+
+# observed (nlabels,nlabels) counts; obs[label2,label1]
+def contingency( labels1, labels2, nlabels ):
+
+    codes = np.asarray( labels2, dtype=np.int64 ).ravel()*nlabels
+    codes += np.asarray( labels1 ).ravel()
+
+    obs = np.bincount( codes, minlength=nlabels*nlabels )
+
+    return obs.reshape( (nlabels,nlabels) )
+
+# class to class mapping of first labels to second labels;
+# the row with the largest count in each column (first one on ties)
+def class_lut( obs ):
+    return np.argmax( obs, axis=0 )
+
+def write_lut( lutfile, lut ):
+
+    lfile = open( lutfile, 'w' )
+    lfile.write( ','.join( str(v) for v in lut ) + '\n' )
+    lfile.close()
+
+# column (Ni) and row (Nj) sums of the observed matrix
+def marginals( obs ):
+    return obs.sum( axis=0 ), obs.sum( axis=1 )
+
+# cramer-v of an observed matrix. cells with a zero expected count
+# (an unused label) hold no observations and add nothing to chi squared.
+def cramer_v( obs ):
+
+    nlabels = obs.shape[0]
+    Ni, Nj = marginals( obs )
+    ntotal = Ni.sum()
+
+    expected = np.outer( Nj, Ni )/ntotal
+
+    chisq = np.zeros( obs.shape, dtype=np.float64 )
+    np.divide( (obs - expected)**2, expected, out=chisq, where=expected > 0 )
+
+    return math.sqrt( chisq.sum()/(ntotal*(nlabels-1)) )
+
+# cramer-v value, lut and observed matrix for two label arrays
+def cramer_stats( labels1, labels2, nlabels ):
+
+    obs = contingency( labels1, labels2, nlabels )
+
+    return cramer_v( obs ), class_lut( obs ), obs
+
+# flat indices of about nsamples pixels of a (ny,nx) label map, sorted.
+# random: drawn uniformly without replacement.
+# stratified: a jittered grid; the map is cut into square cells of about
+# ny*nx/nsamples pixels and one random pixel is taken from each cell, so
+# the sample covers the whole area (and every day of stacked days).
+# the same seed gives the same pixels.
+def sample_index( ny, nx, nsamples, stratified=False, seed=0 ):
+
+    rng = np.random.default_rng( seed )
+
+    npixels = ny*nx
+    if nsamples >= npixels:
+        return np.arange( npixels )
+
+    if not stratified:
+        return np.sort( rng.choice( npixels, nsamples, replace=False ) )
+
+    step = math.sqrt( npixels/nsamples )
+    y0 = np.arange( 0, ny, step ).astype( np.int64 )
+    x0 = np.arange( 0, nx, step ).astype( np.int64 )
+
+    # cell extents, edge cells may be partial
+    hy = np.diff( np.append( y0, ny ) )
+    hx = np.diff( np.append( x0, nx ) )
+
+    shape = (y0.size,x0.size)
+    y = y0[:,None] + ( rng.random( shape )*hy[:,None] ).astype( np.int64 )
+    x = x0[None,:] + ( rng.random( shape )*hx[None,:] ).astype( np.int64 )
+
+    return ( y*nx + x ).ravel()
+
+# bootstrap confidence interval of the cramer-v of an observed matrix.
+# resampling the pixels with replacement gives multinomial cell counts
+# with the observed proportions, so each replicate is drawn directly
+# as a matrix. returns (lower, upper) percentiles for level conf.
+def cv_interval( obs, nboot=200, conf=0.95, seed=0 ):
+
+    rng = np.random.default_rng( seed )
+
+    ntotal = int( obs.sum() )
+    p = obs.ravel()/ntotal
+    boots = rng.multinomial( ntotal, p, size=nboot )
+
+    cvs = np.empty( nboot, dtype=np.float64 )
+    for b in range( nboot ):
+        cvs[b] = cramer_v( boots[b].reshape( obs.shape ) )
+
+    alpha = (1.0 - conf)/2
+    lower, upper = np.quantile( cvs, [alpha, 1.0-alpha] )
+
+    return lower, upper
@@ -0,0 +1,114 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file day_pool.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Extract daily feature cubes in parallel into a shared .npy file.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# extract daily feature cubes in parallel into a shared .npy file.
+#
+# days are independent, so each worker process reads and prepares whole
+# days with its own operators and writes each cube into the day's rows
+# of a memory mapped output (days stacked along y). only the day index
+# and the per-variable extremes travel back, so day order is kept no
+# matter which worker finishes first.
+
+day_pool_copyright = 'day_pool.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from prep_eto_pack import prep_eto
+from wrf_source_pack import wrf_source
+
+from eto_prep import eto_prep
+from features import day_features
+from feature_cache import feature_cache
+from stream_norm import stream_norm
+
+# -------------------------------------------------------------
+
+# per worker operators and settings
+_src = None
+_prep = None
+_cache = None
+_settings = None
+
+def init_worker( albedo, bandstr, nvars, single_pass, cachedir, cachemax,
+                 vector_prep ):
+    global _src, _prep, _cache, _settings
+
+    _src = wrf_source.wrf_source( 'wrf_source' )
+
+    if vector_prep:
+        _prep = eto_prep( 'eto_prep' )
+    else:
+        _prep = prep_eto.prep_eto( 'prep_eto' )
+    _prep.params.albedo = albedo
+
+    if cachedir != None:
+        _cache = feature_cache( cachedir, cachemax )
+
+    _settings = (bandstr, nvars, single_pass)
+
+# extract one day into slot k of the output; returns k and the
+# day's per-variable min/max for streaming normalization
+def extract_worker( job ):
+
+    k, f, outpath = job
+    bandstr, nvars, single_pass = _settings
+
+    cube = day_features( f, _src, _prep, bandstr, nvars, single_pass,
+                         cache=_cache )
+    ny = cube.buf.shape[0]
+
+    out = np.load( outpath, mmap_mode='r+' )
+    out[k*ny:(k+1)*ny] = cube.buf
+    out.flush()
+    del out
+
+    snrm = stream_norm( nvars )
+    snrm.update( cube.buf )
+
+    print( 'done ', f, file=sys.stderr, flush=True )
+
+    return k, snrm.vmin, snrm.vmax
+
+# extract files into slots first, first+1, ... of outpath (an existing
+# .npy file of stacked days) with nworkers processes. a cache directory
+# (see feature_cache.py) may be shared by the workers. with vector_prep
+# days are prepared by eto_prep.py instead of prep_eto. returns
+# (k, vmin, vmax) for each day, in day order.
+def extract_days( files, outpath, first, nworkers, albedo,
+                  bandstr, nvars, single_pass=False,
+                  cachedir=None, cachemax=0, vector_prep=False ):
+
+    jobs = [ (first+k, files[k], outpath) for k in range( len(files) ) ]
+
+    with ProcessPoolExecutor( max_workers=nworkers, initializer=init_worker,
+                              initargs=(albedo, bandstr, nvars,
+                                        single_pass, cachedir,
+                                        cachemax, vector_prep) ) as pool:
+        return list( pool.map( extract_worker, jobs ) )
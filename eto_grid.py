@@ -0,0 +1,141 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file eto_grid.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Hourly and daily reference ETo grids from prepared feature cubes.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# hourly and daily reference ETo grids from prepared feature cubes.
+#
+# the un-normalized cube of a day holds, for each hour, the 8 prepared
+# variables Rn G T D g es ea u2 (see eto_prep.py). FAO-56 hourly
+# Penman-Monteith (eq. 53, short grass) gives ETo in mm/hour:
+#
+#          0.408 D (Rn - G) + g 37/(T + 273) u2 (es - ea)
+#   ETo = ------------------------------------------------
+#                      D + g (1 + 0.34 u2)
+#
+# and the day's ETo (mm/day) is the sum of its 24 hours.
+#
+# the grids are written as float32 .npy files, days in dates file order:
+#   <prefix>_daily.npy    (ndays,ny,nx)
+#   <prefix>_hourly.npy   (ndays,24,ny,nx)
+# each day is one contiguous slab, written as soon as it is computed.
+
+eto_grid_copyright = 'eto_grid.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import numpy as np
+
+# -------------------------------------------------------------
+
+# hourly ETo (ny,nx,nhours) of prepared hours (ny,nx,nhours,>=8).
+# out and work (three arrays like out) are float32, made if not given
+def eto_hours( hours, out=None, work=None ):
+
+    shape = hours.shape[:3]
+    if out is None:
+        out = np.empty( shape, dtype=np.float32 )
+    if work is None:
+        work = [ np.empty( shape, dtype=np.float32 ) for i in range( 3 ) ]
+    a, b, c = work
+
+    rn = hours[...,0]
+    G = hours[...,1]
+    T = hours[...,2]
+    D = hours[...,3]
+    g = hours[...,4]
+    es = hours[...,5]
+    ea = hours[...,6]
+    u2 = hours[...,7]
+
+    # radiation term 0.408 D (Rn - G)
+    np.subtract( rn, G, out=a )
+    np.multiply( a, D, out=a )
+    np.multiply( a, np.float32( 0.408 ), out=a )
+
+    # aerodynamic term g 37/(T+273) u2 (es - ea)
+    np.subtract( es, ea, out=b )
+    np.multiply( b, u2, out=b )
+    np.multiply( b, g, out=b )
+    np.add( T, np.float32( 273.0 ), out=c )
+    np.divide( b, c, out=b )
+    np.multiply( b, np.float32( 37.0 ), out=b )
+    np.add( a, b, out=a )
+
+    # D + g (1 + 0.34 u2)
+    np.multiply( u2, np.float32( 0.34 ), out=c )
+    np.add( c, np.float32( 1.0 ), out=c )
+    np.multiply( c, g, out=c )
+    np.add( c, D, out=c )
+
+    return np.divide( a, c, out=out )
+
+class eto_writer():
+    def __init__( self, prefix, ndays, ny, nx, hourly=True, nhours=24 ):
+
+        self.prefix = prefix
+        self.nhours = nhours
+
+        self.daily = np.lib.format.open_memmap( prefix + '_daily.npy',
+                                                mode='w+', dtype=np.float32,
+                                                shape=(ndays,ny,nx) )
+        self.hourly = None
+        if hourly:
+            self.hourly = np.lib.format.open_memmap( prefix + '_hourly.npy',
+                                                     mode='w+',
+                                                     dtype=np.float32,
+                                                     shape=(ndays,nhours,
+                                                            ny,nx) )
+
+        # reused for every day
+        self.eto = np.empty( (ny,nx,nhours), dtype=np.float32 )
+        self.work = [ np.empty( (ny,nx,nhours), dtype=np.float32 )
+                      for i in range( 3 ) ]
+
+    # ETo of day k from its prepared hours (ny,nx,nhours,>=8)
+    def put( self, k, hours ):
+
+        eto = eto_hours( hours, self.eto, self.work )
+
+        if self.hourly is not None:
+            self.hourly[k] = np.moveaxis( eto, 2, 0 )
+        np.sum( eto, axis=2, out=self.daily[k] )
+
+    # ETo of days k, k+1, ... from un-normalized feature cubes stacked
+    # along y, hour-major with nvars variables (see features.py)
+    def put_days( self, k, buf, nvars=8 ):
+
+        ny, nx = self.eto.shape[:2]
+        for j in range( buf.shape[0]//ny ):
+            hours = buf[j*ny:(j+1)*ny].reshape( (ny,nx,self.nhours,nvars) )
+            self.put( k+j, hours )
+
+    def close( self ):
+
+        self.daily.flush()
+        if self.hourly is not None:
+            self.hourly.flush()
+        self.daily = None
+        self.hourly = None
+
+# end class eto_writer
@@ -0,0 +1,201 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file eto_prep.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Vectorized whole-day preparation of the Penman-Monteith variables.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# vectorized whole-day preparation of the Penman-Monteith variables.
+#
+# the raw WRF bands, in band string order
+#   TSK EMISS SWDOWN GLW GRDFLX T2 PSFC Q2 U10 V10
+# become the 8 FAO-56 hourly variables
+#   Rn   net radiation, MJ m-2 h-1
+#   G    soil heat flux, MJ m-2 h-1
+#   T    air temperature at 2 m, C
+#   D    slope of the saturation vapour pressure curve, kPa C-1
+#   g    psychrometric constant, kPa C-1
+#   es   saturation vapour pressure, kPa
+#   ea   actual vapour pressure, kPa
+#   u2   wind speed at 2 m, m s-1
+#
+# all 25 slices of a day are converted once and the variables of
+# adjacent slices averaged into the 24 hours, so each slice is done
+# once instead of twice. all arithmetic is float32 into preallocated
+# buffers (ufuncs with out=), so a day makes no temporaries beyond two
+# slice-sized scratch planes.
+#
+# the kernel has not been compared with the "prep_eto" operator, and
+# the following may differ from it:
+#   ea   taken from the mixing ratio as q P/(0.622 + q)
+#   Rn   longwave terms and albedo as written in eto_vars
+#   hours the mean of the converted variables of two slices, where
+#        prep_eto may convert the mean of the raw slices
+# it is held back: collect_data.py and apply_class.py refuse
+# vector_prep while validated is False. set it only once
+# benchmarks/bench_prep.py passes where prep_eto is installed.
+
+eto_prep_copyright = 'eto_prep.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import math
+
+import numpy as np
+
+# -------------------------------------------------------------
+
+SIGMA = 5.670374e-8             # Stefan-Boltzmann, W m-2 K-4
+WM2_MJH = 0.0036                # W m-2 to MJ m-2 h-1
+
+# 10 m to 2 m wind, FAO-56 eq. 47
+U2_FACTOR = 4.87/math.log( 67.8*10.0 - 5.42 )
+
+validated = False               # checked against prep_eto
+
+nraw = 10                       # raw WRF bands
+nout = 8                        # prepared variables
+
+# convert raw bands (...,10) into the prepared variables out (...,8).
+# both float32; work is a pair of (...) float32 scratch arrays
+def eto_vars( raw, albedo, out, work=None ):
+
+    if work is None:
+        work = ( np.empty( raw.shape[:-1], dtype=np.float32 ),
+                 np.empty( raw.shape[:-1], dtype=np.float32 ) )
+    a, b = work
+
+    tsk = raw[...,0]
+    emiss = raw[...,1]
+    swdown = raw[...,2]
+    glw = raw[...,3]
+    grdflx = raw[...,4]
+    t2 = raw[...,5]
+    psfc = raw[...,6]
+    q2 = raw[...,7]
+    u10 = raw[...,8]
+    v10 = raw[...,9]
+
+    rn = out[...,0]
+    G = out[...,1]
+    T = out[...,2]
+    D = out[...,3]
+    g = out[...,4]
+    es = out[...,5]
+    ea = out[...,6]
+    u2 = out[...,7]
+
+    # Rn = (1-albedo) SWDOWN + EMISS GLW - EMISS sigma TSK^4
+    np.square( tsk, out=a )
+    np.square( a, out=a )
+    np.multiply( a, np.float32( SIGMA ), out=a )
+    np.subtract( glw, a, out=a )
+    np.multiply( a, emiss, out=a )
+    np.multiply( swdown, np.float32( 1.0 - albedo ), out=rn )
+    np.add( rn, a, out=rn )
+    np.multiply( rn, np.float32( WM2_MJH ), out=rn )
+
+    np.multiply( grdflx, np.float32( WM2_MJH ), out=G )
+
+    np.subtract( t2, np.float32( 273.15 ), out=T )
+
+    # es = 0.6108 exp( 17.27 T/(T+237.3) ), D = 4098 es/(T+237.3)^2
+    np.add( T, np.float32( 237.3 ), out=a )
+    np.divide( T, a, out=es )
+    np.multiply( es, np.float32( 17.27 ), out=es )
+    np.exp( es, out=es )
+    np.multiply( es, np.float32( 0.6108 ), out=es )
+    np.square( a, out=a )
+    np.divide( es, a, out=D )
+    np.multiply( D, np.float32( 4098.0 ), out=D )
+
+    # g = 0.665e-3 P, P in kPa
+    np.multiply( psfc, np.float32( 0.665e-6 ), out=g )
+
+    # ea from the mixing ratio: q P/(0.622 + q)
+    np.add( q2, np.float32( 0.622 ), out=a )
+    np.multiply( q2, psfc, out=b )
+    np.multiply( b, np.float32( 0.001 ), out=b )
+    np.divide( b, a, out=ea )
+
+    np.hypot( u10, v10, out=u2 )
+    np.multiply( u2, np.float32( U2_FACTOR ), out=u2 )
+
+    return out
+
+# prepare a (ny,nx,ntimes,10) raw day block (see wrf_block.py) into
+# (ny,nx,ntimes-1,8) hours, hour i the mean of slices i and i+1.
+# out, if given, is filled in place
+def prep_day( block, albedo, out=None ):
+
+    ny, nx, nt, nb = block.shape
+    if nb < nraw:
+        raise RuntimeError( 'eto_prep: block has %d bands, %d needed'%
+                            (nb,nraw) )
+
+    raw = np.asarray( block, dtype=np.float32 )
+    slices = eto_vars( raw, albedo,
+                       np.empty( (ny,nx,nt,nout), dtype=np.float32 ) )
+
+    if out is None:
+        out = np.empty( (ny,nx,nt-1,nout), dtype=np.float32 )
+
+    np.add( slices[:,:,:-1], slices[:,:,1:], out=out )
+    np.multiply( out, np.float32( 0.5 ), out=out )
+
+    return out
+
+class params():
+    pass
+
+# the kernel behind the source, sink and params.albedo of an operator,
+# hour by hour (run) or a whole day block (day)
+class eto_prep():
+    def __init__( self, name ):
+
+        self.name = name
+        self.params = params()
+        self.params.albedo = 0.23
+
+        self.source = None
+        self.sink = None
+
+    # features cached with this operator are kept apart from prep_eto's
+    cache_tag = 'eto_prep'
+
+    # source (ny,nx,10) or (ny,nx,20), two slices averaged, as prep_eto
+    def run( self ):
+
+        ny, nx, nb = self.source.shape
+        nslices = nb//nraw
+        block = self.source.reshape( (ny,nx,nslices,nraw) )
+
+        slices = eto_vars( np.asarray( block, dtype=np.float32 ),
+                           self.params.albedo,
+                           np.empty( (ny,nx,nslices,nout),
+                                     dtype=np.float32 ) )
+        self.sink = slices.mean( axis=2, dtype=np.float32 )
+
+    # whole day block at once; see prep_day
+    def day( self, block, out=None ):
+        return prep_day( block, self.params.albedo, out )
+
+# end class eto_prep
@@ -0,0 +1,157 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file feature_cache.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief On-disk cache of un-normalized daily feature cubes with LRU eviction.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# on-disk cache of un-normalized daily feature cubes with LRU eviction.
+#
+# a cube is keyed by its wrfout file (path, modification time, size),
+# the preparation parameters (band string, albedo, number of variables)
+# and how the day was read (single pass or hour by hour), so a changed
+# wrfout file or parameter is a miss. each entry is a .cube.npy file;
+# its modification time is bumped on every hit and the least recently
+# used entries go first when the cache grows past maxbytes. entries are
+# written to a temporary file and renamed, so several processes can
+# share one cache directory.
+#
+# the cache size is kept as a running total of the entries put, so the
+# directory is only listed when the total passes maxbytes and every
+# rescan puts, which picks up entries put by other processes.
+
+feature_cache_copyright = 'feature_cache.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import hashlib
+
+import numpy as np
+
+suffix = '.cube.npy'      # cache entries; other files are left alone
+
+# -------------------------------------------------------------
+
+class feature_cache():
+    def __init__( self, cachedir, maxbytes, rescan=64 ):
+
+        self.cachedir = cachedir
+        self.maxbytes = maxbytes
+        self.rescan = rescan
+
+        self.total = None         # bytes in the cache, as last counted
+        self.nputs = 0
+
+        if not os.path.isdir( cachedir ):
+            os.makedirs( cachedir, exist_ok=True )
+
+    # cache key of a wrfout file prepared with the given parameters;
+    # tag names a preparation other than the prep_eto operator and
+    # single_pass the one pass read of wrf_block.py
+    def key( self, f, bandstr, albedo, nvars, tag='', single_pass=False ):
+
+        st = os.stat( f )
+        ident = (os.path.abspath( f ), st.st_mtime_ns, st.st_size,
+                 bandstr, float( albedo ), nvars)
+        if tag != '':
+            ident += (tag,)
+        if single_pass:
+            ident += ('single_pass',)
+        ident = repr( ident )
+
+        return hashlib.sha1( ident.encode() ).hexdigest()
+
+    def path( self, key ):
+        return os.path.join( self.cachedir, key + suffix )
+
+    # true if key is cached (it may still be evicted before a get)
+    def has( self, key ):
+        return os.path.isfile( self.path( key ) )
+
+    # cached cube for key, or None
+    def get( self, key ):
+
+        path = self.path( key )
+        try:
+            cube = np.load( path )
+        except (FileNotFoundError, ValueError, EOFError):
+            return None         # missing, evicted or partially written
+
+        # mark as recently used
+        try:
+            os.utime( path )
+        except FileNotFoundError:
+            pass
+
+        return cube
+
+    def put( self, key, cube ):
+
+        path = self.path( key )
+        tmp = path + '.%d.tmp'%os.getpid()
+
+        f = open( tmp, 'wb' )
+        np.save( f, cube )
+        f.close()
+        os.replace( tmp, path )
+
+        self.nputs += 1
+        if self.total == None or self.nputs%self.rescan == 0:
+            self.evict()
+            return
+
+        try:
+            self.total += os.stat( path ).st_size
+        except FileNotFoundError:
+            pass                # evicted by another process
+        if self.total > self.maxbytes:
+            self.evict()
+
+    # count the entries and remove the least recently used ones until
+    # under maxbytes
+    def evict( self ):
+
+        entries = []
+        total = 0
+        for name in os.listdir( self.cachedir ):
+            if not name.endswith( suffix ):
+                continue
+            try:
+                st = os.stat( os.path.join( self.cachedir, name ) )
+            except FileNotFoundError:
+                continue
+            entries.append( (st.st_mtime, st.st_size, name) )
+            total += st.st_size
+
+        entries.sort()
+        for mtime, size, name in entries:
+            if total <= self.maxbytes:
+                break
+            try:
+                os.remove( os.path.join( self.cachedir, name ) )
+            except FileNotFoundError:
+                pass            # removed by another process
+            total -= size
+
+        self.total = total
+
+# end class feature_cache
@@ -0,0 +1,444 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file feature_store.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Chunked, optionally compressed, on-disk store of daily feature cubes.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# chunked, optionally compressed, on-disk store of daily feature cubes.
+#
+# a store is a directory:
+#
+#   meta.json               grid shape, bands, dtype, tile size,
+#                           compressor and the date index
+#                           (date -> wrfout file)
+#   days/YYYY-MM-DD/yy_xx   one chunk per day and spatial tile
+#
+# a chunk holds the (tile,tile,nbands) values of one tile of one day
+# (edge tiles may be smaller), compressed with blosc (lz4) or lz4 when
+# available. a date range or a pixel window reads only the chunks it
+# covers. read() stacks the selected days along y, the same layout as
+# the collected .npy files, so the training and cramer scripts take
+# either. dates come from the wrfout file names in the dates/*.txt lists.
+#
+# a normalized store records the contents of the coefficients file its
+# days were normalized with; days normalized with other coefficients
+# are refused, so a store never mixes scales.
+#
+# a raw store keeps un-normalized days, so days can be added one at a
+# time without touching the others. the metadata holds the running
+# per-variable min/max and a norm.coeffs file written from them (see
+# stream_norm.py); reads normalize with the "cnorm" operator on the fly.
+
+feature_store_copyright = 'feature_store.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import re
+import json
+import shutil
+
+import numpy as np
+
+from npyfile import load_npy
+from stream_norm import stream_norm
+
+# optional fast compressors
+try:
+    import blosc
+except ImportError:
+    blosc = None
+
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+
+# date of a wrfout file, eg. wrfout_d03_2017-01-01_06-00-00
+WRF_DATE = re.compile( r'wrfout_d\d\d_(\d{4}-\d{2}-\d{2})_' )
+
+# -------------------------------------------------------------
+
+def wrf_date( path ):
+
+    m = WRF_DATE.search( os.path.basename( path ) )
+    if m == None:
+        raise RuntimeError( 'feature_store: no date in ' + path )
+
+    return m.group( 1 )
+
+# (date, wrfout file) for each line of a dates file
+def date_index( datesfile ):
+
+    f = open( datesfile )
+    index = [ (wrf_date( line.strip() ), line.strip())
+              for line in f if line.strip() != '' ]
+    f.close()
+
+    return index
+
+def is_store( path ):
+    return os.path.isfile( os.path.join( path, 'meta.json' ) )
+
+# the best compressor available here
+def default_compressor():
+
+    if blosc != None:
+        return 'blosc'
+    if lz4frame != None:
+        return 'lz4'
+
+    return 'none'
+
+def compress( buf, compressor ):
+
+    if compressor == 'blosc':
+        return blosc.compress( buf.tobytes(), typesize=buf.itemsize,
+                               cname='lz4', shuffle=blosc.SHUFFLE )
+    if compressor == 'lz4':
+        return lz4frame.compress( buf.tobytes() )
+
+    return buf.tobytes()
+
+def decompress( data, compressor ):
+
+    if compressor == 'blosc':
+        return blosc.decompress( data )
+    if compressor == 'lz4':
+        return lz4frame.decompress( data )
+
+    return data
+
+class feature_store():
+    def __init__( self, path ):
+
+        self.path = path
+
+        f = open( os.path.join( path, 'meta.json' ) )
+        self.meta = json.load( f )
+        f.close()
+
+        self.ny = self.meta['ny']
+        self.nx = self.meta['nx']
+        self.nbands = self.meta['nbands']
+        self.dtype = np.dtype( self.meta['dtype'] )
+        self.tile = self.meta['tile']
+        self.compressor = self.meta['compressor']
+        self.raw = self.meta.get( 'raw', False )
+        self.nvars = self.meta.get( 'nvars', 8 )
+
+        if self.compressor == 'blosc' and blosc == None or \
+           self.compressor == 'lz4' and lz4frame == None:
+            raise RuntimeError( 'feature_store: ' + path + ' needs the ' +
+                                self.compressor + ' module' )
+
+    # sorted dates in the store
+    def dates( self ):
+        return sorted( self.meta['days'] )
+
+    # dates from start to end inclusive ('YYYY-MM-DD', None is open)
+    def select( self, start=None, end=None ):
+        return [ d for d in self.dates()
+                 if (start == None or d >= start) and
+                    (end == None or d <= end) ]
+
+    def write_meta( self ):
+
+        path = os.path.join( self.path, 'meta.json' )
+        tmp = path + '.%d.tmp'%os.getpid()
+
+        f = open( tmp, 'w' )
+        json.dump( self.meta, f, indent=1, sort_keys=True )
+        f.close()
+        os.replace( tmp, path )
+
+    def day_dir( self, date ):
+        return os.path.join( self.path, 'days', date )
+
+    # store the (ny,nx,nbands) cube of one day. the day is recorded in
+    # meta.json by the next write_meta, once per batch of days; a day
+    # written but not recorded is not in the store and is added again
+    def put_day( self, date, cube, wrffile='' ):
+
+        if cube.shape != (self.ny,self.nx,self.nbands):
+            raise RuntimeError( 'feature_store: day ' + date + ' has shape ' +
+                                str( cube.shape ) )
+
+        # write the chunks aside and move them in as a whole
+        daydir = self.day_dir( date )
+        tmp = daydir + '.%d.tmp'%os.getpid()
+        os.makedirs( tmp )
+
+        t = self.tile
+        for ty in range( 0, self.ny, t ):
+            for tx in range( 0, self.nx, t ):
+                chunk = np.ascontiguousarray( cube[ty:ty+t,tx:tx+t],
+                                              dtype=self.dtype )
+                f = open( os.path.join( tmp, '%02d_%02d'%(ty//t,tx//t) ),
+                          'wb' )
+                f.write( compress( chunk, self.compressor ) )
+                f.close()
+
+        if os.path.isdir( daydir ):
+            shutil.rmtree( daydir )
+        os.replace( tmp, daydir )
+
+        self.meta['days'][date] = wrffile
+        if self.raw:
+            self.update_extremes( cube )
+
+    # record the coefficients file days of a normalized store are
+    # normalized with, or check that it has the recorded contents
+    def use_coeffs( self, coeffsfile ):
+
+        if self.raw:
+            return
+        if coeffsfile == None:
+            raise RuntimeError( 'feature_store: ' + self.path + ' needs the '
+                                'coefficients file the days were '
+                                'normalized with' )
+
+        f = open( coeffsfile, 'rb' )
+        coeffs = f.read().decode( 'latin-1' )
+        f.close()
+
+        if 'coeffs' not in self.meta:
+            if len( self.meta['days'] ) > 0:
+                raise RuntimeError( 'feature_store: ' + self.path +
+                                    ' does not record its coefficients, '
+                                    'no days can be added' )
+            self.meta['coeffs'] = coeffs
+            self.write_meta()
+
+        elif self.meta['coeffs'] != coeffs:
+            raise RuntimeError( 'feature_store: ' + coeffsfile + ' is not '
+                                'the coefficients file the days of ' +
+                                self.path + ' were normalized with' )
+
+    # store days stacked along y (ndays*ny,nx,nbands), one per wrfout file.
+    # days for a normalized store come with their coefficients file
+    def put_days( self, files, data, coeffsfile=None ):
+
+        self.use_coeffs( coeffsfile )
+
+        for k in range( len(files) ):
+            self.put_day( wrf_date( files[k] ),
+                          data[k*self.ny:(k+1)*self.ny], files[k] )
+
+        self.write_meta()
+
+    # window (y0,y1,x0,x1) of one day into out (y1-y0,x1-x0,nbands)
+    def read_day( self, date, window, out ):
+
+        y0, y1, x0, x1 = window
+        daydir = self.day_dir( date )
+
+        t = self.tile
+        for ty in range( y0//t*t, y1, t ):
+            for tx in range( x0//t*t, x1, t ):
+                f = open( os.path.join( daydir, '%02d_%02d'%(ty//t,tx//t) ),
+                          'rb' )
+                data = decompress( f.read(), self.compressor )
+                f.close()
+
+                th = min( t, self.ny-ty )
+                tw = min( t, self.nx-tx )
+                chunk = np.frombuffer( data, dtype=self.dtype ).reshape(
+                    (th,tw,self.nbands) )
+
+                # overlap of tile and window
+                cy0, cy1 = max( y0, ty ), min( y1, ty+th )
+                cx0, cx1 = max( x0, tx ), min( x1, tx+tw )
+                out[cy0-y0:cy1-y0,cx0-x0:cx1-x0] = \
+                    chunk[cy0-ty:cy1-ty,cx0-tx:cx1-tx]
+
+    # days from start to end (inclusive) in a pixel window (y0,y1,x0,x1),
+    # stacked along y: (ndays*(y1-y0),x1-x0,nbands)
+    def read( self, start=None, end=None, window=None ):
+
+        if window == None:
+            window = (0,self.ny,0,self.nx)
+        y0, y1, x0, x1 = window
+        if not (0 <= y0 < y1 <= self.ny and 0 <= x0 < x1 <= self.nx):
+            raise RuntimeError( 'feature_store: window ' + str( window ) +
+                                ' is outside the grid' )
+
+        dates = self.select( start, end )
+        h = y1 - y0
+
+        out = np.empty( (len(dates)*h,x1-x0,self.nbands), dtype=self.dtype )
+        for k in range( len(dates) ):
+            self.read_day( dates[k], window, out[k*h:(k+1)*h] )
+
+        if self.raw:
+            self.normalize( out )
+
+        return out
+
+    # (ndays,nbands) history of pixel (y,x) from start to end
+    def pixel( self, y, x, start=None, end=None ):
+        return self.read( start, end, (y,y+1,x,x+1) ).reshape(
+            (-1,self.nbands) )
+
+    # running per-variable min/max of a raw store
+    def extremes( self ):
+
+        snrm = stream_norm( self.nvars )
+        if 'vmin' in self.meta:
+            snrm.merge( np.array( self.meta['vmin'] ),
+                        np.array( self.meta['vmax'] ) )
+
+        return snrm
+
+    def update_extremes( self, cube ):
+
+        snrm = self.extremes()
+        snrm.update( cube )
+        self.meta['vmin'] = snrm.vmin.tolist()
+        self.meta['vmax'] = snrm.vmax.tolist()
+
+    def coeffs_path( self ):
+        return os.path.join( self.path, 'norm.coeffs' )
+
+    # true if norm.coeffs was written from the current extremes
+    def coeffs_current( self ):
+        return self.meta.get( 'coeffs_vmin' ) == self.meta.get( 'vmin' ) and \
+               self.meta.get( 'coeffs_vmax' ) == self.meta.get( 'vmax' )
+
+    # have the "norm" operator write norm.coeffs from the extremes
+    def write_coeffs( self, nrm ):
+
+        filepath, write = nrm.params.filepath, nrm.params.write
+        nrm.params.filepath = self.coeffs_path()
+        nrm.params.write = True
+
+        self.extremes().write_coeffs( nrm, self.nbands, self.dtype )
+
+        nrm.params.filepath, nrm.params.write = filepath, write
+
+        self.meta['coeffs_vmin'] = self.meta['vmin']
+        self.meta['coeffs_vmax'] = self.meta['vmax']
+        self.write_meta()
+
+    # normalize data read from a raw store in place
+    def normalize( self, data, nrows=4*171 ):
+
+        if not self.coeffs_current():
+            raise RuntimeError( 'feature_store: ' + self.path +
+                                ' coefficients are out of date' )
+
+        # the cnorm operator is only needed to read raw stores
+        from cnorm_pack import cnorm
+
+        cnrm = cnorm.cnorm( 'cnorm' )
+        cnrm.params.clip = False
+        cnrm.params.filepath = self.coeffs_path()
+
+        stream_norm( self.nvars ).apply( cnrm, data, nrows )
+
+# end class feature_store
+
+# make an empty store
+# (raw for un-normalized days of nvars interlaced variables)
+def create_store( path, ny, nx, nbands, tile=57, compressor=None,
+                  dtype=np.float32, raw=False, nvars=8 ):
+
+    if compressor == None:
+        compressor = default_compressor()
+
+    os.makedirs( os.path.join( path, 'days' ), exist_ok=True )
+
+    meta = { 'ny': ny, 'nx': nx, 'nbands': nbands,
+             'dtype': np.dtype( dtype ).name, 'tile': tile,
+             'compressor': compressor, 'days': {},
+             'raw': raw, 'nvars': nvars }
+
+    f = open( os.path.join( path, 'meta.json' ), 'w' )
+    json.dump( meta, f, indent=1, sort_keys=True )
+    f.close()
+
+    return feature_store( path )
+
+# training data from a store (date range start to end, pixel window
+# (y0,y1,x0,x1)) or from a .npy file (whole, memory mapped with
+# mode, see npyfile.load_npy)
+def read_features( path, start=None, end=None, window=None, mode='r' ):
+
+    if is_store( path ):
+        return feature_store( path ).read( start, end, window )
+
+    if start != None or end != None or window != None:
+        raise RuntimeError( 'feature_store: ' + path + ' is not a store; '
+                            'date ranges and windows need a store' )
+
+    return load_npy( path, mode )
+
+# path of a .npy copy of a store (dates start to end, pixel window) in
+# scratchdir, for readers that need one mappable file (eg. worker
+# processes). the copy is rebuilt when the store changes.
+def store_npy( path, scratchdir, start=None, end=None, window=None ):
+
+    tag = '' if (start,end,window) == (None,None,None) else \
+          '.' + selection_tag( start, end, window )
+    scratch = os.path.join( scratchdir, os.path.basename(
+        os.path.normpath( path ) ) + tag + '.store.npy' )
+    meta = os.path.join( path, 'meta.json' )
+    if os.path.isfile( scratch ) and \
+       os.path.getmtime( scratch ) >= os.path.getmtime( meta ):
+        return scratch
+
+    store = feature_store( path )
+    if window == None:
+        window = (0,store.ny,0,store.nx)
+    y0, y1, x0, x1 = window
+    h = y1 - y0
+
+    dates = store.select( start, end )
+    out = np.lib.format.open_memmap( scratch, mode='w+', dtype=store.dtype,
+                                     shape=(len(dates)*h,x1-x0,
+                                            store.nbands) )
+    for k in range( len(dates) ):
+        store.read_day( dates[k], window, out[k*h:(k+1)*h] )
+    if store.raw:
+        store.normalize( out )
+    out.flush()
+    del out
+
+    return scratch
+
+# short text naming a selection, eg. for cache keys
+def selection_tag( start=None, end=None, window=None ):
+
+    tag = str( start ) + '_' + str( end )
+    if window != None:
+        tag += '_%d-%d-%d-%d'%tuple( window )
+
+    return tag
+
+# 'y0,y1,x0,x1' to a window tuple
+def parse_window( text ):
+
+    window = tuple( int( v ) for v in text.split( ',' ) )
+    if len( window ) != 4:
+        raise ValueError( 'window needs y0,y1,x0,x1: ' + text )
+
+    return window
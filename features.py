@@ -0,0 +1,169 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file features.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Daily feature cube assembled in place from hourly ETo variables.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# daily feature cube assembled in place from hourly ETo variables.
+#
+# the variables are interlaced on an hourly basis:
+#   Rn(hour 0) G(hour 0) ... u2(hour 0) Rn(hour 1) G(hour 1) ...
+# which is the order np.append gave when appending hour by hour.
+
+features_copyright = 'features.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+import numpy as np
+
+# -------------------------------------------------------------
+
+# list of wrfout files named in a dates file; blank lines are skipped
+def read_datafiles( path ):
+
+    datafiles = open( path )
+    files = [ f.strip() for f in datafiles if f.strip() != '' ]
+    datafiles.close()
+
+    return files
+
+class feature_cube():
+    def __init__( self, ny, nx, nhours=24, nvars=8, dtype=np.float32,
+                  buf=None ):
+
+        self.nhours = nhours
+        self.nvars = nvars
+
+        # (ny,nx,nhours*nvars) buffer, allocated once; or a given
+        # contiguous buffer such as one day of a stack of days
+        if buf is None:
+            buf = np.empty( (ny,nx,nhours*nvars), dtype=dtype )
+        self.buf = buf
+
+        # same memory seen as (ny,nx,nhours,nvars)
+        self.hours = self.buf.reshape( (ny,nx,nhours,nvars) )
+
+    # strided view of one variable over all hours
+    def var( self, j ):
+        return self.buf[:,:,j::self.nvars]
+
+    # write one hour of (ny,nx,>=nvars) values in place
+    def put_hour( self, i, values ):
+        self.hours[:,:,i,:] = values[:,:,:self.nvars]
+
+    # write a whole day of (ny,nx,nhours,>=nvars) values in place
+    def put_day( self, values ):
+        self.hours[...] = values[:,:,:,:self.nvars]
+
+# end class feature_cube
+
+# feature cache key of a wrfout file prepared by prep. days prepared
+# by another operator than prep_eto (see eto_prep.py) or read in a
+# single pass get their own keys
+def day_key( cache, f, prep, bandstr, nvars, single_pass ):
+    return cache.key( f, bandstr, prep.params.albedo, nvars,
+                      getattr( prep, 'cache_tag', '' ), single_pass )
+
+# feature cube of one wrfout file. with single_pass the file is read once
+# and the day prepared in one "prep_eto" call (see wrf_block.py);
+# otherwise the "wrf_source" operator reads two slices for every hour.
+# bandstr is the template band string with 'ts' for the time slice.
+# if cube is given it is filled in place, else a new one is made.
+# with a feature_cache (see feature_cache.py) days already prepared
+# with the same file and parameters are taken from the cache.
+# a block already read from f (see prefetch.py) is used instead of
+# reading the file again, and a cube already taken from the cache
+# (cached) is used without looking it up again.
+def day_features( f, src, prep, bandstr, nvars, single_pass=False, cube=None,
+                  cache=None, block=None, cached=None ):
+
+    if cached is None and cache != None:
+        key = day_key( cache, f, prep, bandstr, nvars, single_pass )
+        cached = cache.get( key )
+        if cached is None:
+            cube = day_features( f, src, prep, bandstr, nvars, single_pass,
+                                 cube, block=block )
+            cache.put( key, cube.buf )
+            return cube
+
+    if cached is not None:
+        if cube is None:
+            ny, nx = cached.shape[:2]
+            cube = feature_cube( ny, nx, 24, nvars, cached.dtype )
+        cube.buf[...] = cached
+        return cube
+
+    if single_pass:
+
+        # netCDF4 is only needed by the single pass read
+        from wrf_block import band_names, read_wrf_block, prep_block
+
+        # all 25 slices of the 10 variables, one read per variable
+        if block is None:
+            block = read_wrf_block( f, band_names( bandstr ), 25 )
+
+        # actual values for Penman-Montieth, adjacent slices averaged
+        hours = prep_block( prep, block )   # (ny,nx,24,>=nvars)
+
+        # hour-major interlace, same order as appending hour by hour
+        if cube is None:
+            ny, nx = hours.shape[:2]
+            cube = feature_cube( ny, nx, 24, nvars )
+        cube.put_day( hours )
+
+        return cube
+
+    # read two slices and average actual values over the day
+    # NOTE: should be using spin-up values
+    for i in range(0,24):
+
+        # construct wrf_source band string, replace 'ts' with first time slice value
+        bstr = bandstr.replace('ts','%02d'%i )
+
+        # second time slice is added to string
+        # if operator "prep_eto" sees 10 bands it will implement directly
+        # if operator "prep_eto" sees 20 bands it will implement two sets
+        # and return an average
+        # tell the source operator to get both time slices
+        src.params.bandstr = bstr + ',' + bandstr.replace('ts','%02d'%(i+1) )
+
+        # read the file with specified bands to extract
+        src.params.filepath = f
+        src.run()
+
+        # process raw variables to get actual input values for Penman-Montieth
+        prep.source = src.sink
+        prep.run()
+
+        # time slice variable augmentation to feature space
+        # implicitly introduces diurnal weather influences over time
+        if cube is None:
+            ny, nx = prep.sink.shape[:2]
+            cube = feature_cube( ny, nx, 24, nvars )
+        cube.put_hour( i, prep.sink )
+
+        print( '.', end='', file=sys.stderr, flush=True )
+
+    print( '\n', file=sys.stderr, flush=True )
+
+    return cube
@@ -32,7 +32,9 @@ pixval_copyright = 'pixval.py Copyright (c) 2020-2022 Scott L. Williams, release
 import os
 import sys
 
-from npy_source_pack import npy_source
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath(__file__) ), '..' ) )
+from npyfile import load_npy
+from feature_store import is_store, feature_store
 
 # list pixels to sample (numpy arrays have origin at top left)
 # format used is x,y
@@ -48,20 +50,39 @@ dirpath = './'
 inpath = dirpath + 'jan-mar_2019.npy'
 outpath = dirpath + 'jan-mar_2019.csv'
 
+# inpath may also be a feature store (see feature_store.py); then each
+# pixel's history from start to end ('YYYY-MM-DD', None is open) is
+# written, one date,x,y,... line per day
+start = None
+end = None
+
 # ----------------------------------------------------------------
 
-# instantiate the numpy source operator
-src = npy_source.npy_source( 'npy_source' )
-src.params.filepath = inpath 
+# write one line of band values
+def write_bands( out, bands ):
+
+    nbands = len( bands )
+    for j in range( nbands-1 ):
+        out.write( str(bands[j]) + ',' )
+    
+    out.write( str(bands[nbands-1]) + '\n' )
 
 # output file
 out = open( outpath, 'w' )
 out.write( inpath + '\n' ) # report numpy file
 
-src.run()   # read the numpy data
+# memory map the numpy data; only the listed pixels are read.
+# a store reads only the tiles holding the pixels
+if is_store( inpath ):
+    store = feature_store( inpath )
+    dates = store.select( start, end )
+    height,width,nbands = store.ny, store.nx, store.nbands
+else:
+    store = None
+    data = load_npy( inpath )
 
-# get dimensions
-height,width,nbands = src.sink.shape
+    # get dimensions
+    height,width,nbands = data.shape
 
 for i in range( len(pixels) ):
     x = pixels[i][0]
@@ -76,20 +97,21 @@ for i in range( len(pixels) ):
     if x < 0 or x >= width:
         print( 'pixel: ', i, ' has out of range x value: ', x )
         continue
+
+    if store != None:
+        history = store.pixel( y, x, start, end )
+        for k in range( len(dates) ):
+            out.write( dates[k] + ',' + str(x) +',' + str(y) + ',' )
+            write_bands( out, history[k] )
+        continue
     
     # report pixel position to file as x,y
     out.write( str(x) +',' + str(y) + ',' )
 
     # retrieve the specified pixel's data
-    bands = src.sink[y,x,:] # numpy uses y,x format
+    bands = data[y,x,:] # numpy uses y,x format
 
     # write out values 
-    for j in range( nbands-1 ):
-        out.write( str(bands[j]) + ',' )
-    
-    out.write( str(bands[nbands-1]) + '\n' )
+    write_bands( out, bands )
         
 out.close()
-           
-
-
@@ -0,0 +1,279 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file label_stats.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Class transitions, persistence and modal class maps of daily labels.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# class transitions, persistence and modal class maps of daily labels.
+#
+# the daily labels of "apply_class.py" (ny,nx,ndays) are read
+# chunkdays days at a time from a memory map; the last day and the open
+# runs are carried over between chunks, so any number of days fits in
+# memory. written with prefix:
+#   _transitions.npy  (nclasses,nclasses) pixel counts of class a on a
+#                     day followed by class b the next day
+#   _changes.npy      (ny,nx) days on which each pixel changed class
+#   _runs.npy         (nclasses,maxrun) histogram of persistence: runs
+#                     of 1, 2, ... days in a class (the last bin holds
+#                     maxrun days or more); runs cut by the end of the
+#                     labels are counted as they stand
+#   _frequency.npy    (ngroups,ny,nx,nclasses) share of days in each
+#                     class per pixel; group 0 is all days, groups 1-12
+#                     the months, when the dates file is given
+#   _modal.npy        (ngroups,ny,nx) most frequent class per pixel
+#                     (255 where a group has no days)
+
+label_stats_copyright = 'label_stats.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+import getopt
+
+import numpy as np
+
+from npyfile import load_npy
+from feature_store import date_index
+
+# -------------------------------------------------------------
+
+class label_stats():
+    def __init__( self, nclasses, ny, nx, maxrun=60, ngroups=1 ):
+
+        self.nclasses = nclasses
+        self.maxrun = maxrun
+        self.ngroups = ngroups
+        self.ndays = 0
+
+        self.transitions = np.zeros( (nclasses,nclasses), dtype=np.int64 )
+        self.changes = np.zeros( (ny,nx), dtype=np.int32 )
+        self.runs = np.zeros( (nclasses,maxrun), dtype=np.int64 )
+        self.counts = np.zeros( (ngroups,ny,nx,nclasses), dtype=np.int32 )
+
+        # carried between chunks: last day's labels and run lengths
+        self.last = None
+        self.run = np.zeros( (ny,nx), dtype=np.int64 )
+
+    # add chunk (ny,nx,nd) of labels; groups (nd) are the days' groups
+    # (besides group 0)
+    def update( self, chunk, groups=None ):
+
+        nc = self.nclasses
+        ny, nx, nd = chunk.shape
+        lab = np.asarray( chunk, dtype=np.int64 )
+        if lab.min() < 0 or lab.max() >= nc:
+            raise RuntimeError( 'label_stats: labels outside 0..%d'%(nc-1) )
+
+        # with the previous chunk's last day in front
+        if self.last is not None:
+            lab = np.concatenate( (self.last[:,:,None],lab), axis=2 )
+
+        # transitions of consecutive days
+        a = lab[:,:,:-1]
+        b = lab[:,:,1:]
+        self.transitions += np.bincount( ( a*nc + b ).ravel(),
+                                         minlength=nc*nc ).reshape( (nc,nc) )
+        self.changes += ( a != b ).sum( axis=2, dtype=np.int32 )
+
+        # runs: a change ends the run of the class before it
+        maxrun = self.maxrun
+        run = self.run
+        for t in range( lab.shape[2] - nd, lab.shape[2] ):
+            if t > 0:
+                ended = lab[:,:,t] != lab[:,:,t-1]
+                if ended.any():
+                    length = np.minimum( run[ended], maxrun ) - 1
+                    self.runs += np.bincount( lab[:,:,t-1][ended]*maxrun +
+                                              length,
+                                              minlength=nc*maxrun
+                                              ).reshape( (nc,maxrun) )
+                    run[ended] = 0
+            run += 1
+
+        # class counts per pixel, for all days and per group
+        lab = lab[:,:,lab.shape[2]-nd:]
+        self.add_counts( 0, lab )
+        if groups is not None:
+            groups = np.asarray( groups )
+            for g in np.unique( groups ):
+                self.add_counts( g, lab[:,:,groups == g] )
+
+        self.last = lab[:,:,-1].copy()
+        self.ndays += nd
+
+    # class counts of lab (ny,nx,nd) into group g
+    def add_counts( self, g, lab ):
+
+        nc = self.nclasses
+        ny, nx, nd = lab.shape
+        npix = ny*nx
+
+        index = np.arange( npix, dtype=np.int64 )[:,None]*nc
+        index = index + lab.reshape( (npix,nd) )
+        self.counts[g] += np.bincount( index.ravel(),
+                                       minlength=npix*nc
+                                       ).reshape( (ny,nx,nc) ).astype( np.int32 )
+
+    # close the open runs at the end of the labels
+    def finish( self ):
+
+        if self.last is None:
+            return
+
+        nc = self.nclasses
+        length = np.minimum( self.run, self.maxrun ) - 1
+        self.runs += np.bincount( ( self.last*self.maxrun + length ).ravel(),
+                                  minlength=nc*self.maxrun
+                                  ).reshape( (nc,self.maxrun) )
+        self.run[...] = 0
+
+    # share of days in each class per pixel, (ngroups,ny,nx,nclasses)
+    def frequency( self ):
+
+        days = self.counts.sum( axis=3, keepdims=True )
+        with np.errstate( invalid='ignore', divide='ignore' ):
+            return ( self.counts/days ).astype( np.float32 )
+
+    # most frequent class per pixel, (ngroups,ny,nx); ties go to the
+    # lowest class, 255 where a group has no days
+    def modal( self ):
+
+        modal = np.argmax( self.counts, axis=3 ).astype( np.uint8 )
+        modal[self.counts.sum( axis=3 ) == 0] = 255
+
+        return modal
+
+    def write( self, prefix ):
+
+        np.save( prefix + '_transitions.npy', self.transitions )
+        np.save( prefix + '_changes.npy', self.changes )
+        np.save( prefix + '_runs.npy', self.runs )
+        np.save( prefix + '_frequency.npy', self.frequency() )
+        np.save( prefix + '_modal.npy', self.modal() )
+
+# end class label_stats
+
+# month (1-12) of each day of a dates file
+def date_months( datesfile ):
+    return [ int( date[5:7] ) for date, f in date_index( datesfile ) ]
+
+# label_stats of a labels file (ny,nx,ndays), chunkdays days at a time.
+# with a dates file, class frequencies are also kept per month
+def analyze( labelsfile, nclasses, datesfile=None, chunkdays=64, maxrun=60 ):
+
+    labels = load_npy( labelsfile )
+    ny, nx, ndays = labels.shape
+
+    months = None
+    ngroups = 1
+    if datesfile != None:
+        months = np.array( date_months( datesfile ) )
+        if len( months ) != ndays:
+            raise RuntimeError( 'label_stats: ' + datesfile + ' does not '
+                                'list the %d days of '%ndays + labelsfile )
+        ngroups = 13
+
+    stats = label_stats( nclasses, ny, nx, maxrun, ngroups )
+    for k in range( 0, ndays, chunkdays ):
+        groups = None if months is None else months[k:k+chunkdays]
+        stats.update( labels[:,:,k:k+chunkdays], groups )
+    stats.finish()
+
+    return stats
+
+def usage():
+        print( 'usage: label_stats.py', file=sys.stderr )
+        print( '       -h, --help', file=sys.stderr )
+        print( '       -l labelsfile, --labels=labelsfile', file=sys.stderr )
+        print( '       -c nclasses, --classes=nclasses', file=sys.stderr )
+        print( '       -d datesfile, --dates=datesfile (monthly maps)',
+               file=sys.stderr )
+        print( '       -o prefix, --out=prefix', file=sys.stderr )
+        print( '       -k chunkdays, --chunk=chunkdays', file=sys.stderr )
+        print( '       -m maxrun, --maxrun=maxrun', file=sys.stderr )
+
+def get_params( argv ):
+    labelsfile = None
+    nclasses = 25
+    datesfile = None
+    prefix = None
+    chunkdays = 64
+    maxrun = 60
+
+    try:
+        opts, args = getopt.getopt( argv, 'hl:c:d:o:k:m:',
+                                    ['help','labels=','classes=','dates=',
+                                     'out=','chunk=','maxrun='] )
+
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt in ( '-h', '--help' ):
+            usage()
+            sys.exit(0)
+        elif opt in ( '-l', '--labels' ):
+            labelsfile = arg
+        elif opt in ( '-c', '--classes' ):
+            nclasses = int( arg )
+        elif opt in ( '-d', '--dates' ):
+            datesfile = arg
+        elif opt in ( '-o', '--out' ):
+            prefix = arg
+        elif opt in ( '-k', '--chunk' ):
+            chunkdays = int( arg )
+        elif opt in ( '-m', '--maxrun' ):
+            maxrun = int( arg )
+        else:
+            usage()
+            sys.exit(1)
+
+    if labelsfile == None:
+        print( 'label_stats: labels file is missing...exiting' )
+        sys.exit(1)
+    if prefix == None:
+        print( 'label_stats: output prefix is missing...exiting' )
+        sys.exit(1)
+
+    return labelsfile, nclasses, datesfile, prefix, chunkdays, maxrun
+
+####################################################################
+# command line user entry point
+####################################################################
+if __name__ == '__main__':
+
+    labelsf,nclasses,datesf,prefix,chunkdays,maxrun = \
+        get_params( sys.argv[1:] )
+
+    try:
+        stats = analyze( labelsf, nclasses, datesf, chunkdays, maxrun )
+    except RuntimeError as e:
+        print( e, '...exiting', file=sys.stderr )
+        sys.exit( 1 )
+
+    stats.write( prefix )
+
+    # days a pixel stays in its class, over all transitions
+    stay = np.trace( stats.transitions )/max( 1, stats.transitions.sum() )
+    print( stats.ndays, 'days; persistence %.3f'%stay, file=sys.stderr )
+    print( 'wrote', prefix + '_*.npy', file=sys.stderr )
@@ -0,0 +1,117 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file labels2som.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Convert SOM .labels files to binary .som files.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# convert SOM .labels files to binary .som files (see somfile.py).
+# arguments are .labels files or directories, which are searched
+# recursively. each .som file is written next to its .labels file;
+# up to date .som files are skipped unless forced.
+
+labels2som_copyright = 'labels2som.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+import getopt
+
+from somfile import som_path, convert
+
+# -------------------------------------------------------------
+
+# .labels files named by paths, directories searched recursively
+def find_labels( paths ):
+
+    files = []
+    for path in paths:
+        if os.path.isdir( path ):
+            for root, dirs, names in os.walk( path ):
+                dirs.sort()
+                for name in sorted( names ):
+                    if name.endswith( '.labels' ):
+                        files.append( os.path.join( root, name ) )
+        else:
+            files.append( path )
+
+    return files
+
+def usage():
+        print( 'usage: labels2som.py [options] labelsfile|directory ...',
+               file=sys.stderr )
+        print( '       -h, --help', file=sys.stderr )
+        print( '       -f, --force     convert up to date files too',
+               file=sys.stderr )
+
+def get_params( argv ):
+    force = False
+
+    try:
+        opts, args = getopt.getopt( argv, 'hf', ['help','force'] )
+
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt in ( '-h', '--help' ):
+            usage()
+            sys.exit(0)
+        elif opt in ( '-f', '--force' ):
+            force = True
+        else:
+            usage()
+            sys.exit(1)
+
+    if len( args ) == 0:
+        print( 'labels2som: no .labels files given...exiting' )
+        sys.exit(1)
+
+    return args, force
+
+####################################################################
+# command line user entry point
+####################################################################
+if __name__ == '__main__':
+
+    paths, force = get_params( sys.argv[1:] )
+
+    nconverted = 0
+    for labelsfile in find_labels( paths ):
+
+        sompath = som_path( labelsfile )
+        if not force and os.path.isfile( sompath ) and \
+           os.path.getmtime( sompath ) >= os.path.getmtime( labelsfile ):
+            continue
+
+        try:
+            convert( labelsfile, sompath )
+        except RuntimeError as e:
+            print( 'labels2som: skipping', labelsfile, ':', e,
+                   file=sys.stderr )
+            continue
+
+        print( labelsfile, '->', sompath, file=sys.stderr )
+        nconverted += 1
+
+    print( 'converted', nconverted, 'files', file=sys.stderr )
@@ -0,0 +1,147 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file npy2store.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Load a collected .npy data file into a chunked feature store.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# load a collected .npy data file (days stacked along y) into a chunked
+# feature store (see feature_store.py). the dates file the data was
+# collected from names the days, in order, and the coefficients file it
+# was normalized with goes with it. days go into an existing store only
+# if it was normalized with the same coefficients, replacing days with
+# the same date.
+
+npy2store_copyright = 'npy2store.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+import getopt
+
+from npyfile import load_npy
+from feature_store import is_store, feature_store, create_store
+from feature_store import default_compressor, date_index
+
+# -------------------------------------------------------------
+
+def usage():
+        print( 'usage: npy2store.py', file=sys.stderr )
+        print( '       -h, --help', file=sys.stderr )
+        print( '       -d datesfile, --dates=datesfile', file=sys.stderr )
+        print( '       -i npyfile, --input=npyfile', file=sys.stderr )
+        print( '       -n coeffsfile, --coeffs=coeffsfile', file=sys.stderr )
+        print( '       -o storedir, --out=storedir', file=sys.stderr )
+        print( '       -t tile, --tile=tile (default 57)', file=sys.stderr )
+        print( '       -c compressor, --compressor=blosc|lz4|none',
+               file=sys.stderr )
+
+def get_params( argv ):
+    datesfile = None
+    npyfile = None
+    coeffsfile = None
+    storedir = None
+    tile = 57
+    compressor = default_compressor()
+
+    try:
+        opts, args = getopt.getopt( argv, 'hd:i:n:o:t:c:',
+                                    ['help','dates=','input=','coeffs=',
+                                     'out=','tile=','compressor='] )
+
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt in ( '-h', '--help' ):
+            usage()
+            sys.exit(0)
+        elif opt in ( '-d', '--dates' ):
+            datesfile = arg
+        elif opt in ( '-i', '--input' ):
+            npyfile = arg
+        elif opt in ( '-n', '--coeffs' ):
+            coeffsfile = arg
+        elif opt in ( '-o', '--out' ):
+            storedir = arg
+        elif opt in ( '-t', '--tile' ):
+            tile = int( arg )
+        elif opt in ( '-c', '--compressor' ):
+            compressor = arg
+        else:
+            usage()
+            sys.exit(1)
+
+    if datesfile == None:
+        print( 'npy2store: dates file is missing...exiting' )
+        sys.exit(1)
+    if npyfile == None:
+        print( 'npy2store: npy file is missing...exiting' )
+        sys.exit(1)
+    if coeffsfile == None:
+        print( 'npy2store: coefficients file is missing...exiting' )
+        sys.exit(1)
+    if storedir == None:
+        print( 'npy2store: store directory is missing...exiting' )
+        sys.exit(1)
+
+    return datesfile, npyfile, coeffsfile, storedir, tile, compressor
+
+####################################################################
+# command line user entry point
+####################################################################
+if __name__ == '__main__':
+
+    datesf,npyf,coeffsf,stored,tile,compressor = get_params( sys.argv[1:] )
+
+    try:
+        files = [ f for date, f in date_index( datesf ) ]
+    except RuntimeError as e:
+        print( 'npy2store:', e, '...exiting', file=sys.stderr )
+        sys.exit( 1 )
+
+    data = load_npy( npyf )
+
+    ndays = len( files )
+    ny = data.shape[0]//ndays
+    if ny*ndays != data.shape[0]:
+        print( 'npy2store:', npyf, 'does not hold', ndays, 'days...exiting',
+               file=sys.stderr )
+        sys.exit( 1 )
+
+    if is_store( stored ):
+        store = feature_store( stored )
+        if store.raw:
+            print( 'npy2store:', stored, 'is a raw store, collected files '
+                   'are normalized...exiting', file=sys.stderr )
+            sys.exit( 1 )
+    else:
+        store = create_store( stored, ny, data.shape[1], data.shape[2],
+                              tile, compressor, data.dtype )
+
+    try:
+        store.put_days( files, data, coeffsf )
+    except RuntimeError as e:
+        print( 'npy2store:', e, '...exiting', file=sys.stderr )
+        sys.exit( 1 )
+
+    print( 'stored', ndays, 'days in', stored, file=sys.stderr )
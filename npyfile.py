@@ -0,0 +1,92 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file npyfile.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Open numpy data files as read-only memory maps.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# open numpy data files as read-only memory maps.
+# older data files were written with ndarray.dump (a pickle) and
+# cannot be mapped; those are either read whole (load_npy) or converted
+# once to a scratch .npy file (open_npy).
+
+npyfile_copyright = 'npyfile.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+
+import numpy as np
+
+# -------------------------------------------------------------
+
+# true if the file is in numpy .npy format (not a pickle dump)
+def is_npy( path ):
+
+    with open( path, 'rb' ) as f:
+        magic = f.read( len(np.lib.format.MAGIC_PREFIX) )
+
+    return magic == np.lib.format.MAGIC_PREFIX
+
+# path of a mappable .npy version of datafile. pickled dumps are
+# converted into scratchdir; the copy is rebuilt if the datafile is newer.
+def npy_path( datafile, scratchdir ):
+
+    if is_npy( datafile ):
+        return datafile
+
+    scratch = os.path.join( scratchdir, os.path.basename( datafile ) +
+                            '.mmap.npy' )
+    if os.path.isfile( scratch ) and \
+       os.path.getmtime( scratch ) >= os.path.getmtime( datafile ):
+        return scratch
+
+    print( 'converting ' + datafile + ' to ' + scratch + '...',
+           file=sys.stderr, end='', flush=True )
+    data = np.load( datafile, allow_pickle=True )
+    np.save( scratch, data )
+    del data
+    print( 'done', file=sys.stderr, flush=True )
+
+    return scratch
+
+# read-only memory map of a data file (see npy_path)
+def open_npy( datafile, scratchdir ):
+    return np.load( npy_path( datafile, scratchdir ), mmap_mode='r' )
+
+# a data file as a read-only memory map; pages are read as they are
+# touched and shared with other processes mapping the same file.
+# mode 'c' maps copy-on-write instead: the array is writeable, pages
+# written are copied privately and the file never changes (for
+# operators that may write to their input). an older pickled file is
+# read into memory instead.
+def load_npy( datafile, mode='r' ):
+
+    if is_npy( datafile ):
+        return np.load( datafile, mmap_mode=mode )
+
+    print( datafile + ' is a pickle, reading it whole (rewrite it with '
+           'np.save to map it)...', file=sys.stderr, end='', flush=True )
+    data = np.load( datafile, allow_pickle=True )
+    print( 'done', file=sys.stderr, flush=True )
+
+    return data
@@ -0,0 +1,197 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file prefetch.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Read wrfout day blocks ahead of use in a background thread.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# read wrfout day blocks ahead of use in a background thread.
+#
+# a reader thread runs through the files in order, reading each day's
+# block (see wrf_block.py) into a queue of at most depth days, so the
+# netCDF reads overlap with preparing and classifying earlier days.
+# days come out in file order. netCDF is only touched by the reader
+# thread; the compute side must not read wrfout files itself. days in
+# the feature cache are loaded by the reader too and handed over with
+# the block, so an entry evicted between the lookup and its use cannot
+# send the compute side back to the wrfout file.
+#
+# the reader keeps counts to size depth for the storage at hand:
+#   read time   seconds the reader spent reading
+#   wait time   seconds the consumer waited for a day (reads too slow)
+#   full time   seconds the reader waited for room (compute too slow)
+#   readahead   days ready in the queue when the consumer asked,
+#               mean and max
+# a wait time near zero means the reads are hidden; a full time near
+# the read time means depth can be lowered.
+
+prefetch_copyright = 'prefetch.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+import time
+import queue
+import threading
+
+from wrf_block import band_names, read_wrf_block
+from features import day_key
+
+# -------------------------------------------------------------
+
+class prefetch_reader():
+    def __init__( self, files, varnames, depth=2, ntimes=25, lookup=None ):
+
+        self.files = list( files )
+        self.varnames = varnames
+        self.depth = depth
+        self.ntimes = ntimes
+
+        # lookup(f) not None: the day is not read and comes out as
+        # that array instead, eg. its cube from the feature cache
+        self.lookup = lookup
+
+        self.queue = queue.Queue( maxsize=depth )
+        self.stop = threading.Event()
+
+        # counters
+        self.nread = 0
+        self.nskipped = 0
+        self.ndays = 0
+        self.read_time = 0.0
+        self.wait_time = 0.0
+        self.full_time = 0.0
+        self.ahead_sum = 0
+        self.ahead_max = 0
+
+        self.thread = threading.Thread( target=self.reader, daemon=True )
+        self.thread.start()
+
+    # reader thread: (f, block, cached) per file, or (f, exception, None)
+    # on error
+    def reader( self ):
+
+        for f in self.files:
+            if self.stop.is_set():
+                return
+
+            try:
+                cached = None
+                if self.lookup != None:
+                    cached = self.lookup( f )
+
+                if cached is not None:
+                    item = (f, None, cached)
+                    self.nskipped += 1
+                else:
+                    t0 = time.perf_counter()
+                    block = read_wrf_block( f, self.varnames, self.ntimes )
+                    self.read_time += time.perf_counter() - t0
+                    self.nread += 1
+                    item = (f, block, None)
+            except Exception as e:
+                item = (f, e, None)
+
+            t0 = time.perf_counter()
+            while not self.stop.is_set():
+                try:
+                    self.queue.put( item, timeout=0.1 )
+                    break
+                except queue.Full:
+                    pass
+            self.full_time += time.perf_counter() - t0
+
+            if isinstance( item[1], Exception ):
+                return
+
+    def __iter__( self ):
+        return self
+
+    # next (f, block, cached) in file order; block is None for days
+    # found by lookup, cached None for days read. an error in the
+    # reader is raised here
+    def __next__( self ):
+
+        if self.ndays == len( self.files ):
+            raise StopIteration
+
+        ahead = self.queue.qsize()
+        self.ahead_sum += ahead
+        self.ahead_max = max( self.ahead_max, ahead )
+
+        t0 = time.perf_counter()
+        f, block, cached = self.queue.get()
+        self.wait_time += time.perf_counter() - t0
+        self.ndays += 1
+
+        if isinstance( block, Exception ):
+            self.close()
+            raise block
+
+        return f, block, cached
+
+    # stop reading ahead (eg. when leaving the loop early)
+    def close( self ):
+        self.stop.set()
+        self.thread.join()
+
+    # counters as a dictionary
+    def stats( self ):
+        return { 'days': self.ndays,
+                 'read': self.nread,
+                 'skipped': self.nskipped,
+                 'depth': self.depth,
+                 'read time': self.read_time,
+                 'wait time': self.wait_time,
+                 'full time': self.full_time,
+                 'mean readahead': self.ahead_sum/max( 1, self.ndays ),
+                 'max readahead': self.ahead_max }
+
+    def report( self, out=sys.stderr ):
+
+        s = self.stats()
+        print( 'prefetch: %d days (%d read, %d skipped), depth %d'%
+               (s['days'],s['read'],s['skipped'],s['depth']), file=out )
+        print( 'prefetch: read %.1fs, waited %.1fs for reads, '
+               '%.1fs for room'%(s['read time'],s['wait time'],
+                                 s['full time']), file=out )
+        print( 'prefetch: readahead mean %.2f max %d days'%
+               (s['mean readahead'],s['max readahead']), file=out,
+               flush=True )
+
+# end class prefetch_reader
+
+# a prefetch_reader of the blocks day_features reads (see features.py)
+# for files, or None when depth is 0 or days are read hour by hour
+# (single_pass off). days found in the feature cache (prepared by
+# prep) are not read; the reader hands over their cached cube.
+def day_reader( files, bandstr, depth, single_pass, cache=None,
+                prep=None, nvars=8 ):
+
+    if depth <= 0 or not single_pass:
+        return None
+
+    lookup = None
+    if cache != None:
+        lookup = lambda f: cache.get( day_key( cache, f, prep, bandstr,
+                                               nvars, single_pass ) )
+
+    return prefetch_reader( files, band_names( bandstr ), depth, 25, lookup )
@@ -0,0 +1,114 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file render_labels.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Render a daily labels file to one JPEG per day.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# render a daily labels file, as written by "apply_class.py", to one
+# JPEG per day (SOM0000.jpg, SOM0001.jpg, ...). use when apply_class
+# was run with images off, or to redo the images with another lut.
+
+render_labels_copyright = 'render_labels.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+import getopt
+
+from npyfile import load_npy
+from render_pool import render_pool, read_lut
+
+# -------------------------------------------------------------
+
+# labels file is (ny,nx,ndays)
+def render_labels( labelsfile, imagedir, lutfile, nthreads=2 ):
+
+    dclass = load_npy( labelsfile )
+
+    if not os.path.isdir( imagedir ):
+        os.makedirs( imagedir )
+
+    rpool = render_pool( read_lut( lutfile ), nthreads )
+    for k in range( dclass.shape[2] ):
+        rpool.put( dclass[:,:,k], os.path.join( imagedir, 'SOM%04d.jpg'%k ) )
+    rpool.close()
+
+    return dclass.shape[2]
+
+def usage():
+        print( 'usage: render_labels.py', file=sys.stderr )
+        print( '       -h, --help', file=sys.stderr )
+        print( '       -l labelsfile, --labels=labelsfile', file=sys.stderr )
+        print( '       -o imagedir, --out=imagedir', file=sys.stderr )
+        print( '       -u lutfile, --lut=lutfile', file=sys.stderr )
+        print( '       -t nthreads, --threads=nthreads', file=sys.stderr )
+
+def get_params( argv ):
+    labelsfile = None
+    imagedir = None
+    lutfile = './luts/eighthbow.lut'
+    nthreads = 2
+
+    try:
+        opts, args = getopt.getopt( argv, 'hl:o:u:t:',
+                                    ['help','labels=','out=','lut=',
+                                     'threads='] )
+
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt in ( '-h', '--help' ):
+            usage()
+            sys.exit(0)
+        elif opt in ( '-l', '--labels' ):
+            labelsfile = arg
+        elif opt in ( '-o', '--out' ):
+            imagedir = arg
+        elif opt in ( '-u', '--lut' ):
+            lutfile = arg
+        elif opt in ( '-t', '--threads' ):
+            nthreads = int( arg )
+        else:
+            usage()
+            sys.exit(1)
+
+    if labelsfile == None:
+        print( 'render_labels: labels file is missing...exiting' )
+        sys.exit(1)
+    if imagedir == None:
+        print( 'render_labels: image directory is missing...exiting' )
+        sys.exit(1)
+
+    return labelsfile, imagedir, lutfile, nthreads
+
+####################################################################
+# command line user entry point
+####################################################################
+if __name__ == '__main__':
+
+    labelsf,imaged,lutf,nthreads = get_params( sys.argv[1:] )
+
+    ndays = render_labels( labelsf, imaged, lutf, nthreads )
+    print( 'rendered', ndays, 'days to', imaged, file=sys.stderr )
@@ -0,0 +1,113 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file render_pool.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Colorize label maps with a LUT and write JPEGs in background threads.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# colorize label maps with a LUT and write JPEGs in background threads.
+#
+# label maps are queued (bounded, so a slow disk holds back the producer
+# rather than filling memory) and a few writer threads colorize and
+# encode them. JPEG encoding releases the interpreter lock, so the
+# writers run alongside classification.
+
+render_pool_copyright = 'render_pool.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+import queue
+import threading
+
+import numpy as np
+from PIL import Image
+
+# -------------------------------------------------------------
+
+# read a luts/*.lut palette; one 'r,g,b' line per grey level.
+# returns a (256,3) uint8 array, missing levels are black.
+def read_lut( lutfile ):
+
+    lut = np.zeros( (256,3), dtype=np.uint8 )
+
+    f = open( lutfile, 'r' )
+    i = 0
+    for line in f:
+        if line.strip() == '' or i > 255:
+            continue
+        lut[i] = [ int(v) for v in line.split( ',' ) ]
+        i += 1
+    f.close()
+
+    return lut
+
+# (ny,nx) labels to (ny,nx,3) colors in one table lookup
+def colorize( labels, lut ):
+    return lut[labels]
+
+def write_jpg( labels, lut, filepath ):
+    Image.fromarray( colorize( labels, lut ) ).save( filepath )
+
+class render_pool():
+    def __init__( self, lut, nthreads=2, depth=16 ):
+
+        self.lut = lut
+        self.queue = queue.Queue( maxsize=depth )
+        self.errors = []
+
+        self.threads = []
+        for i in range( nthreads ):
+            t = threading.Thread( target=self.writer, daemon=True )
+            t.start()
+            self.threads.append( t )
+
+    def writer( self ):
+
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+
+            labels, filepath = job
+            try:
+                write_jpg( labels, self.lut, filepath )
+            except Exception as e:
+                self.errors.append( (filepath, e) )
+
+    # queue a (ny,nx) label map; blocks while the queue is full.
+    # the labels are copied so the caller can reuse its buffer.
+    def put( self, labels, filepath ):
+        self.queue.put( (np.array( labels, dtype=np.uint8 ), filepath) )
+
+    # wait for all queued images to be written
+    def close( self ):
+
+        for t in self.threads:
+            self.queue.put( None )
+        for t in self.threads:
+            t.join()
+
+        for filepath, e in self.errors:
+            print( 'render_pool: could not write', filepath, ':', e,
+                   file=sys.stderr )
+
+# end class render_pool
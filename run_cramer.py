@@ -33,13 +33,50 @@ import os
 import sys
 import getopt
 
-from cramer import cramer
+import numpy as np
+
+from cramer import cramer, cramer_labels, som_labels, read_data, data_hash
+from cramer import readsom, sampled_labels, cramer_sample
+from cvstats import sample_index
+from cramer_pool import cramer_matrix, write_matrix
+from somfile import load_som, som_errors, read_manifest
 
 datafile = 'full2021.npy'
+
+# with a feature store as datafile (see feature_store.py) the soms can
+# be compared over a date range ('YYYY-MM-DD', inclusive) and a pixel
+# window (y0,y1,x0,x1). None takes everything
+start = None
+end = None
+window = None
 outfile = 'cramer_2021_5x5_5_00725_3.results'
 
+matrixfile = 'cramer_2021_5x5_5_00725_3.matrix'   # full NxN Cramer-V matrix
+
 lutdir = 'LUTs_2021_5x5_5_00725_3/'
 
+# read the datafile once and label each SOM once, then compare the
+# label maps. label maps are cached in labeldir, keyed by the som file
+# and datafile hashes, so later runs on the same data skip labelling.
+# set to False to run cramer() for each pair (reads data every time).
+reuse_labels = True
+labeldir = 'label_cache/'
+
+# number of worker processes. with more than one worker the soms are
+# labelled and the pairs compared in a process pool sharing a memory
+# mapped copy of the datafile; label maps always go through labeldir.
+nworkers = 1
+
+# sampling mode for quick parameter sweeps. with nsamples > 0 each som
+# labels only about nsamples pixels (the same pixels, drawn with seed,
+# for every som), random or spatially stratified, and each result gets
+# a 95% bootstrap interval from nboot resamples. runs serially.
+# set nsamples to 0 for exact values.
+nsamples = 0
+stratified = True
+seed = 0
+nboot = 200
+
 results = open( outfile, 'w' )
 
 somset = [ './LABELS_2021/5x5_5_00725_3/2021_5x5_5_00725_01.labels',
@@ -52,10 +89,17 @@ somset = [ './LABELS_2021/5x5_5_00725_3/2021_5x5_5_00725_01.labels',
            './LABELS_2021/5x5_5_00725_3/2021_5x5_5_00725_08.labels',
            './LABELS_2021/5x5_5_00725_3/2021_5x5_5_00725_09.labels',
            './LABELS_2021/5x5_5_00725_3/2021_5x5_5_00725_10.labels' ]
+
+# or the soms listed in a manifest written by train_multi.py; None
+# uses somset above
+manifest = None
            
 
 
 # ------------------------------------------------------------------------
+if manifest != None:
+    somset = read_manifest( manifest )
+
 nsoms = len(somset)
 
 # check if files exist
@@ -65,6 +109,19 @@ for i in range( nsoms ):
                file=sys.stderr )
         sys.exit( 1 )
 
+# report the soms and check they have the same shape before labelling.
+# files are parsed once; later reads of the same file are free
+for i in range( nsoms ):
+    header, neurons = load_som( somset[i] )
+    qe, te = som_errors( header )
+    print( somset[i], ' neurons:', neurons.shape[0], ' QE:', qe, ' TE:', te,
+           file=sys.stderr, flush=True )
+
+    if neurons.shape != load_som( somset[0] )[1].shape:
+        print( 'run_cramer: som maps do have same shape...exiting',
+               file=sys.stderr )
+        sys.exit( 1 )
+
 if not os.path.isdir( lutdir ):
     os.mkdir( lutdir )
     
@@ -73,33 +130,108 @@ total = 0
 for i in range( nsoms ):
     total += i
 
+if nsamples > 0:
+    data = read_data( datafile, start, end, window )
+
+    ny, nx, ndim = data.shape
+    index = sample_index( ny, nx, nsamples, stratified, seed )
+    print( 'sampling', index.size, 'of', ny*nx, 'pixels',
+           file=sys.stderr, flush=True )
+
+    # labels of the sampled pixels for each som
+    somlabels = []
+    for i in range( nsoms ):
+        print( 'labelling: ', somset[i], file=sys.stderr, flush=True )
+        som = readsom( somset[i] )
+        somlabels.append( sampled_labels( som, data, index ) )
+    nlabels0 = som.shape[0]
+
+    del data
+
+elif reuse_labels and nworkers == 1:
+    if not os.path.isdir( labeldir ):
+        os.mkdir( labeldir )
+
+    data = read_data( datafile, start, end, window )
+
+    print( 'hashing datafile...', file=sys.stderr, end='', flush=True )
+    datahash = data_hash( datafile, start, end, window )
+    print( 'done', file=sys.stderr, flush=True )
+
+    # label map for each som
+    somlabels = []
+    for i in range( nsoms ):
+        print( 'labelling: ', somset[i], file=sys.stderr, flush=True )
+        labels, nlabels = som_labels( somset[i], data, labeldir, datahash )
+
+        if i == 0:
+            nlabels0 = nlabels
+        elif nlabels != nlabels0:
+            print( 'run_cramer: som maps do have same shape...exiting',
+                   file=sys.stderr )
+            sys.exit( 1 )
+        somlabels.append( labels )
+
+    del data
+
 print( 'comparing', nsoms, 'som mapfiles with each other, for a total of',
        total, ' comparisons.', file=sys.stderr, flush=True )
 print( 'results are in the file:', outfile,
        file=sys.stderr, flush=True )
 
-k = 0
+# pairs to compare
+pairs = []
 for j in range( nsoms ):
     for i in range( j+1, nsoms ):
 
-        print( '\ncomparing: ', somset[j], somset[i],
-               file=sys.stderr, flush=True )
-
         #lutfile = lutdir + str(j+1) + '-' + str(i+1) + '.lut'
 
         # use train run numbers
         tag1 = somset[j][-9:-7]
         tag2 = somset[i][-9:-7]
         lutfile = lutdir + tag1 + '-' + tag2 + '.lut'
+        pairs.append( (j,i,lutfile) )
 
-        Cv = cramer( datafile, somset[j], somset[i], lutfile )
-        results.write( somset[j] + ' ' +  somset[i] + ' %.4f\n'%Cv )
-        results.flush()
-        k += 1
-        print( 'result for', somset[j], ' ',  somset[i],
-               ' -> Cv=%.4f'%Cv, ' %d'%k, 'out of %d'%total,
+if nworkers > 1 and nsamples == 0:
+    cvs = cramer_matrix( datafile, somset, pairs, labeldir, nworkers,
+                         start, end, window )
+
+matrix = np.eye( nsoms )  # a som is identical to itself
+
+k = 0
+for j, i, lutfile in pairs:
+
+    if nsamples > 0:
+        Cv, lower, upper = cramer_sample( somlabels[j], somlabels[i],
+                                          nlabels0, lutfile, nboot, seed )
+    elif nworkers > 1:
+        Cv = cvs[k]
+    else:
+        print( '\ncomparing: ', somset[j], somset[i],
                file=sys.stderr, flush=True )
 
-results.close()
+        if reuse_labels:
+            Cv = cramer_labels( somlabels[j], somlabels[i], nlabels0, lutfile,
+                                somset[j], somset[i] )
+        else:
+            Cv = cramer( datafile, somset[j], somset[i], lutfile,
+                         start=start, end=end, window=window )
+
+    if nsamples > 0:
+        # estimate followed by its 95% interval
+        results.write( somset[j] + ' ' +  somset[i] +
+                       ' %.4f %.4f %.4f\n'%(Cv,lower,upper) )
+    else:
+        results.write( somset[j] + ' ' +  somset[i] + ' %.4f\n'%Cv )
+    results.flush()
+    matrix[j,i] = matrix[i,j] = Cv
+    k += 1
+    print( 'result for', somset[j], ' ',  somset[i],
+           ' -> Cv=%.4f'%Cv, ' %d'%k, 'out of %d'%total,
+           file=sys.stderr, flush=True )
 
+results.close()
 
+write_matrix( matrixfile, somset, matrix )
+print( 'similarity matrix is in the file:', matrixfile,
+       file=sys.stderr, flush=True )
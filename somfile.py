@@ -0,0 +1,274 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file somfile.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Read SOM weight files, text .labels or binary .som.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# read SOM weight files, text .labels or binary .som.
+#
+# a .labels file is a text header of 'key= value' lines, a NEURONS
+# flag line, 'nneurons ndim' and then one line per neuron: its grey
+# level label followed by its weights.
+#
+# a .som file is the binary companion of a .labels file:
+#
+#   8 bytes    magic b'ETOSOM1\n'
+#   8 bytes    little endian uint64, length of the json header
+#   json       header: the .labels key/value pairs as text plus
+#              'nneurons', 'ndim' and 'offset' of the weights
+#   padding    to a 64 byte boundary
+#   weights    (nneurons,ndim) little endian float32, row order
+#
+# the weights are memory mapped, so loading costs no parsing at all.
+# with a .labels file given, an up to date .som file next to it
+# (same name, .som extension) is read instead.
+
+somfile_copyright = 'somfile.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import json
+import struct
+
+import numpy as np
+
+SOM_MAGIC = b'ETOSOM1\n'
+SOM_ALIGN = 64
+
+# -------------------------------------------------------------
+
+# name of the binary companion of a .labels file
+def som_path( labelsfile ):
+    return os.path.splitext( labelsfile )[0] + '.som'
+
+def is_som( path ):
+
+    with open( path, 'rb' ) as f:
+        magic = f.read( len(SOM_MAGIC) )
+
+    return magic == SOM_MAGIC
+
+# parse a text .labels file; returns (header, neurons) with the header
+# key/value pairs as strings, in file order
+def read_labels( labelsfile ):
+
+    wfile = open( labelsfile, 'r' )
+
+    header = {}
+    found = False
+    for line in wfile:
+        if line.find( 'NEURONS' ) != -1:
+            found = True
+            break
+        key, sep, value = line.partition( '=' )
+        if sep != '':
+            header[key.strip()] = value.strip()
+
+    if not found:
+        wfile.close()
+        raise RuntimeError( 'somfile: no NEURONS flag in ' + labelsfile )
+
+    nneurons,ndim = wfile.readline().split()
+    nneurons = int( nneurons )
+    ndim = int( ndim )
+
+    # each row is the grey level label followed by ndim weights (and in
+    # some files the class pixel count). parse the whole block at once,
+    # as doubles rounded to float32 the same as float() per value would
+    try:
+        block = np.loadtxt( wfile, dtype=np.float64, max_rows=nneurons,
+                            usecols=range( 1, ndim+1 ), ndmin=2 )
+    except ValueError as e:
+        raise RuntimeError( 'somfile: bad weights in ' + labelsfile +
+                            ': ' + str( e ) )
+    finally:
+        wfile.close()
+
+    if block.shape != (nneurons,ndim):
+        raise RuntimeError( 'somfile: expected %d neurons of %d weights in '%
+                            (nneurons,ndim) + labelsfile )
+
+    neurons = block.astype( np.float32 )
+
+    return header, neurons
+
+# read a binary .som file; the weights are a read-only memory map
+def read_som( sompath ):
+
+    f = open( sompath, 'rb' )
+    magic = f.read( len(SOM_MAGIC) )
+    if magic != SOM_MAGIC:
+        f.close()
+        raise RuntimeError( 'somfile: ' + sompath + ' is not a .som file' )
+
+    hlen, = struct.unpack( '<Q', f.read( 8 ) )
+    header = json.loads( f.read( hlen ).decode( 'utf-8' ) )
+    f.close()
+
+    neurons = np.memmap( sompath, dtype='<f4', mode='r',
+                         offset=header['offset'],
+                         shape=(header['nneurons'],header['ndim']) )
+
+    return header, neurons
+
+# write a binary .som file; header values are stored as text
+def write_som( sompath, header, neurons ):
+
+    nneurons, ndim = neurons.shape
+
+    meta = { key: str( value ) for key, value in header.items() }
+    meta['nneurons'] = nneurons
+    meta['ndim'] = ndim
+
+    # the offset is part of the header, so size it with a placeholder
+    # as wide as any offset will be
+    meta['offset'] = 10**12
+    hlen = len( json.dumps( meta ).encode( 'utf-8' ) )
+    offset = len(SOM_MAGIC) + 8 + hlen
+    offset += -offset % SOM_ALIGN
+    meta['offset'] = offset
+
+    hbytes = json.dumps( meta ).encode( 'utf-8' )
+    hbytes += b' '*(hlen - len(hbytes))       # json allows trailing blanks
+
+    # write to a temporary file and rename, readers never see half a file
+    tmp = sompath + '.%d.tmp'%os.getpid()
+    f = open( tmp, 'wb' )
+    f.write( SOM_MAGIC )
+    f.write( struct.pack( '<Q', hlen ) )
+    f.write( hbytes )
+    f.write( b'\0'*(offset - f.tell()) )
+    f.write( np.ascontiguousarray( neurons, dtype='<f4' ).tobytes() )
+    f.close()
+    os.replace( tmp, sompath )
+
+# write a text .labels file as msom does. header is an ordered dict of
+# key/value pairs; the quantization and topographic errors, if there,
+# go after a blank line at the end of the header
+def write_labels( labelsfile, header, neurons ):
+
+    errors = ( 'quantization error', 'topographic error' )
+
+    f = open( labelsfile, 'w' )
+    for key, value in header.items():
+        if key not in errors:
+            f.write( (key + '=').ljust( 26 ) + str( value ) + '\n' )
+
+    f.write( '\n' )
+    for key in errors:
+        if key in header:
+            f.write( (key + '=').ljust( 26 ) + str( header[key] ) + '\n' )
+    f.write( '\n' )
+
+    nneurons, ndim = neurons.shape
+    f.write( '############ NEURONS #############\n' )
+    f.write( ' %d %d\n'%(nneurons,ndim) )
+    for i in range( nneurons ):
+        f.write( '%3d '%i + ''.join( '  %8.6f '%v for v in neurons[i] ) +
+                 '\n' )
+    f.close()
+
+# convert a .labels file to its .som companion
+def convert( labelsfile, sompath=None ):
+
+    if sompath == None:
+        sompath = som_path( labelsfile )
+
+    header, neurons = read_labels( labelsfile )
+    write_som( sompath, header, neurons )
+
+    return sompath
+
+# quantization and topographic error in a header, None if missing.
+# older files spell the keys 'Quantization Error', 'Topographic Error'
+def som_errors( header ):
+
+    errors = { key.lower(): value for key, value in header.items() }
+
+    qe = errors.get( 'quantization error' )
+    te = errors.get( 'topographic error' )
+
+    return ( None if qe == None else float( qe ),
+             None if te == None else float( te ) )
+
+# write a manifest: a text list of SOM files, one per line, for
+# run_cramer.py. comments are written first as '# ' lines. files are
+# listed relative to the manifest's directory
+def write_manifest( manifestfile, somfiles, comments=() ):
+
+    base = os.path.dirname( os.path.abspath( manifestfile ) )
+
+    mfile = open( manifestfile, 'w' )
+    for line in comments:
+        mfile.write( '# ' + line + '\n' )
+    for f in somfiles:
+        mfile.write( os.path.relpath( os.path.abspath( f ), base ) + '\n' )
+    mfile.close()
+
+# SOM files listed in a manifest; relative entries are taken from the
+# manifest's directory. blank and '#' lines are skipped
+def read_manifest( manifestfile ):
+
+    base = os.path.dirname( manifestfile )
+
+    somfiles = []
+    for line in open( manifestfile ):
+        line = line.strip()
+        if line == '' or line.startswith( '#' ):
+            continue
+        somfiles.append( os.path.join( base, line ) )
+
+    return somfiles
+
+# parsed files by absolute path: (mtime, size, header, neurons)
+_loaded = {}
+
+# (header, neurons) of a SOM weight file. a .som file, or a .labels file
+# whose .som companion is at least as new, is memory mapped; otherwise
+# the text is parsed. parsed files are kept (until the file changes),
+# so reading a file again is free; the weights are read-only.
+def load_som( somfile ):
+
+    path = somfile
+    binary = is_som( somfile )
+    if not binary:
+        sompath = som_path( somfile )
+        if os.path.isfile( sompath ) and \
+           os.path.getmtime( sompath ) >= os.path.getmtime( somfile ):
+            path = sompath
+            binary = True
+
+    st = os.stat( path )
+    key = os.path.abspath( path )
+
+    entry = _loaded.get( key )
+    if entry == None or entry[:2] != (st.st_mtime_ns, st.st_size):
+        if binary:
+            header, neurons = read_som( path )
+        else:
+            header, neurons = read_labels( path )
+            neurons.flags.writeable = False
+        entry = (st.st_mtime_ns, st.st_size, header, neurons)
+        _loaded[key] = entry
+
+    return dict( entry[2] ), entry[3]
@@ -0,0 +1,98 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file store_append.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Add newly listed days to a raw feature store.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# add newly listed days to a raw feature store (see feature_store.py).
+#
+# only wrfout files whose dates are not in the store yet are read and
+# prepared; stored days are never rewritten. each new day folds into the
+# store's running min/max, and the coefficients file is rewritten only
+# when those extremes moved. readers normalize on the fly, so a daily
+# refresh costs one day of work.
+
+store_append_copyright = 'store_append.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+
+from features import day_features
+from prefetch import day_reader
+from feature_store import is_store, feature_store, create_store, wrf_date
+
+# -------------------------------------------------------------
+
+# append the days of files missing from the raw store at storepath
+# (created on the first day if need be). nrm is the "norm" operator
+# used to write the coefficients. up to prefetch days are read ahead
+# (see prefetch.py). returns the files added.
+def append_days( storepath, files, src, prep, bandstr, nvars, nrm,
+                 single_pass=False, cache=None, prefetch=0 ):
+
+    store = None
+    have = set()
+    if is_store( storepath ):
+        store = feature_store( storepath )
+        if not store.raw:
+            raise RuntimeError( 'store_append: ' + storepath +
+                                ' holds normalized days; days can only be '
+                                'appended to a raw store' )
+        have = set( store.dates() )
+
+    new = [ f for f in files if wrf_date( f ) not in have ]
+    print( len(new), 'new days for', storepath, file=sys.stderr, flush=True )
+
+    reader = day_reader( new, bandstr, prefetch, single_pass, cache,
+                         prep, nvars )
+
+    for f in new:
+        block = cached = None
+        if reader != None:
+            f, block, cached = next( reader )
+        print( 'processing ', f, file=sys.stderr )
+
+        cube = day_features( f, src, prep, bandstr, nvars, single_pass,
+                             cache=cache, block=block, cached=cached )
+
+        if store == None:
+            ny, nx = cube.buf.shape[:2]
+            store = create_store( storepath, ny, nx, 24*nvars,
+                                  dtype=cube.buf.dtype, raw=True,
+                                  nvars=nvars )
+
+        store.put_day( wrf_date( f ), cube.buf, f )
+
+    if reader != None:
+        reader.report()
+
+    # the new days and extremes, recorded once for the batch
+    if store != None and len( new ) > 0:
+        store.write_meta()
+
+    if store != None and not store.coeffs_current():
+        print( 'extremes changed, writing ' + store.coeffs_path(),
+               file=sys.stderr, flush=True )
+        store.write_coeffs( nrm )
+
+    return new
@@ -0,0 +1,87 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file stream_norm.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Two-pass streaming normalization of interlaced feature data.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# two-pass streaming normalization of interlaced feature data.
+#
+# first pass: running per-variable min/max as days are produced.
+# the "norm" operator then writes the coefficients file from a tiny
+# two pixel (1,2,nbands) array holding those extremes. that the file
+# has the same format and values as a norm run over all the data
+# assumes norm takes one min/max per variable of the skip interlace;
+# unvalidated until benchmarks/check_stream_norm.py passes.
+# second pass: the "cnorm" operator applies the coefficients in place,
+# a few days at a time.
+
+stream_norm_copyright = 'stream_norm.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import numpy as np
+
+# -------------------------------------------------------------
+
+class stream_norm():
+    def __init__( self, nvars ):
+
+        self.nvars = nvars     # interlace factor
+
+        self.vmin = np.full( nvars, np.inf, dtype=np.float64 )
+        self.vmax = np.full( nvars, -np.inf, dtype=np.float64 )
+
+    # fold a (...,nhours*nvars) block into the running statistics
+    def update( self, block ):
+
+        values = block.reshape( (-1,self.nvars) )
+        np.minimum( self.vmin, values.min( axis=0 ), out=self.vmin )
+        np.maximum( self.vmax, values.max( axis=0 ), out=self.vmax )
+
+    # fold in extremes gathered elsewhere (eg. by a worker process)
+    def merge( self, vmin, vmax ):
+        np.minimum( self.vmin, vmin, out=self.vmin )
+        np.maximum( self.vmax, vmax, out=self.vmax )
+
+    # have the norm operator write its coefficients file
+    # (nrm.params.write and nrm.params.filepath set by the caller)
+    def write_coeffs( self, nrm, nbands, dtype=np.float32 ):
+
+        nhours = nbands//self.nvars
+
+        extremes = np.empty( (1,2,nbands), dtype=dtype )
+        extremes[0,0,:] = np.tile( self.vmin, nhours )
+        extremes[0,1,:] = np.tile( self.vmax, nhours )
+
+        nrm.source = extremes
+        nrm.run()
+
+    # normalize data in place with the cnorm operator, nrows at a time
+    # (cnrm.params.filepath pointing to the coefficients file)
+    def apply( self, cnrm, data, nrows ):
+
+        for j in range( 0, data.shape[0], nrows ):
+            cnrm.source = data[j:j+nrows]
+            cnrm.run()
+            data[j:j+nrows] = cnrm.sink
+
+# end class stream_norm
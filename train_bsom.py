@@ -0,0 +1,95 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file train_bsom.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Train a SOM with mini-batch or batch updates and write out labels
+@LICENSE
+# 
+#  Copyright (C) 2020-2022 Scott L. Williams.
+# 
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+#  train a SOM like "train_msom.py" does, with the batch_som operator
+#  (see batch_som.py): many pixels per update, on every core.
+#  the .labels file written is read like msom's by cramer.py,
+#  run_cramer.py and apply_class.py
+
+train_bsom_copyright = 'train_bsom.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import sys
+
+from batch_som import batch_som
+from feature_store import read_features
+
+# data to train on, a collected .npy file or a feature store
+datafile = './jan-mar_2019.npy'
+
+# date range ('YYYY-MM-DD', inclusive) and pixel window (y0,y1,x0,x1)
+# of a feature store; None takes everything
+start = None
+end = None
+window = None
+
+# instantiate the operator
+
+# batch som; same parameters as msom in train_msom.py
+bs = batch_som( 'batch_som' )
+bs.params.shape = (5,5)              # neural net grid shape
+bs.params.sigma = 2.5
+
+bs.params.nepochs = 3                # number of epochs. an epoch
+                                     # is a full sampling of the data.
+
+bs.params.rate = 0.00724             # learning rate per pixel
+bs.params.batch_size = 16384         # pixels per weight update.
+                                     # 0 is the batch map: one update
+                                     # per epoch, rate is not used
+bs.params.show_progress = False
+
+bs.params.init_weights = 'pca'
+bs.params.neighborhood_function = 'gaussian'
+bs.params.topology = 'hexagonal'
+bs.params.activation_distance = 'euclidean'
+bs.params.output_type = 'labels'
+bs.params.mapfile_prefix = 'jan-mar_2019_5x5_3_00724_b01'
+bs.params.rorder = True              # batches at random
+bs.params.seed = None                # None means generate a seed,
+                                     # recorded in the labels file
+bs.params.decay_function = 3         # inverse decay function
+#------------------------------------------------------------
+
+# print the (partial) parameters
+print( 'number of epochs=', bs.params.nepochs, file=sys.stderr, flush=True )
+print( 'learning rate=   ', bs.params.rate, file=sys.stderr, flush=True )
+print( 'batch size=      ', bs.params.batch_size, file=sys.stderr, flush=True )
+print( 'prefix=          ', bs.params.mapfile_prefix, file=sys.stderr, flush=True )
+
+# read the training data
+print( 'reading datafile: ' + datafile + '...',
+       file=sys.stderr, flush=True, end='' )
+data = read_features( datafile, start, end, window )
+print( 'done', file=sys.stderr, flush=True )
+
+# link data to batch_som input and run
+print( 'training ...', file=sys.stderr, flush=True )
+bs.source = data
+bs.run() # train
+print( 'training done', file=sys.stderr, flush=True )
+print( 'seed=              ', bs.params.seed, file=sys.stderr )
+print( 'quantization error=', bs.qe, file=sys.stderr )
+print( 'topographic error= ', bs.te, file=sys.stderr )
@@ -32,15 +32,24 @@ import os
 import sys
 import getopt
 
-from npy_source_pack import npy_source
 from msom_pack import msom
 
-# instantiate the operators
+from feature_store import read_features
+
+# data to train on. a .npy file is memory mapped (see npyfile.py) so
+# concurrent training runs share one copy in the page cache. the map is
+# copy-on-write: msom gets a writeable array, and should it write to its
+# input only the pages written are copied, the file is left alone
+datafile = './jan-mar_2019.npy'
 
-# numpy source
+# a feature store (see feature_store.py) can be trained on a date range
+# ('YYYY-MM-DD', inclusive) and a pixel window (y0,y1,x0,x1) only;
+# None takes everything
+start = None
+end = None
+window = None
 
-src = npy_source.npy_source( 'npy_source' )
-src.params.filepath = './jan-mar_2019.npy'  # data to train on
+# instantiate the operators
 
 # mini-som
 ms = msom.msom( 'msom' )
@@ -74,13 +83,13 @@ print( 'learning rate=   ', ms.params.rate, file=sys.stderr, flush=True )
 print( 'prefix=          ', ms.params.mapfile_prefix, file=sys.stderr, flush=True )
 
 # read the training data
-print( 'reading datafile: ' + src.params.filepath + '...',
+print( 'reading datafile: ' + datafile + '...',
        file=sys.stderr, flush=True, end='' )
-src.run()
+data = read_features( datafile, start, end, window, mode='c' )
 print( 'done', file=sys.stderr, flush=True )
 
-# link src output to msom input and run
+# link data to msom input and run
 print( 'training ...', file=sys.stderr, flush=True )
-ms.source = src.sink
+ms.source = data
 ms.run() # train
 print( 'training done', file=sys.stderr, flush=True )
@@ -0,0 +1,104 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file train_multi.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Train several SOMs concurrently from one shared dataset
+@LICENSE
+# 
+#  Copyright (C) 2020-2022 Scott L. Williams.
+# 
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+# 
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+# 
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+#  train nruns SOMs with the same parameters and different seeds, in
+#  parallel, for repeatability studies. the data is mapped once and
+#  shared by all workers (see train_pool.py). runs are written as
+#  <prefix>_01.labels ... with their seeds in the headers, and listed
+#  in a manifest for run_cramer.py
+
+train_multi_copyright = 'train_multi.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+
+from train_pool import train_runs, run_seeds
+from somfile import write_manifest
+
+# data to train on, a collected .npy file or a feature store
+datafile = './jan-mar_2019.npy'
+
+# date range ('YYYY-MM-DD', inclusive) and pixel window (y0,y1,x0,x1)
+# of a feature store; None takes everything
+start = None
+end = None
+window = None
+
+# scratch directory for a mappable copy of pickled or stored data
+scratchdir = 'train_scratch/'
+
+nruns = 10                 # number of training runs
+nworkers = 4               # runs at the same time
+
+# run k is written as prefix_<k>.labels (k from 01)
+prefix = './LABELS_2019/5x5_3_00724/2019_5x5_3_00724'
+manifest = prefix + '.manifest'
+
+# base seed; each run's seed is drawn from it. None means generate one
+# (it is printed and written to the manifest)
+seed = None
+
+# 'msom' (see train_msom.py) or 'batch_som' (see train_bsom.py)
+trainer = 'msom'
+
+# SOM parameters, as in train_msom.py. for batch_som add 'batch_size'
+params = { 'shape': (5,5),                 # neural net grid shape
+           'sigma': 2.5,
+           'nepochs': 3,                   # number of epochs
+           'rate': 0.00724,                # learning rate
+           'show_progress': False,
+           'init_weights': 'pca',
+           'neighborhood_function': 'gaussian',
+           'topology': 'hexagonal',
+           'activation_distance': 'euclidean',
+           'apply_classification': False,
+           'rorder': True,                 # sample at random
+           'decay_function': 3 }           # inverse decay function
+#------------------------------------------------------------
+
+outdir = os.path.dirname( prefix )
+if outdir != '' and not os.path.isdir( outdir ):
+    os.makedirs( outdir )
+
+seed, seeds = run_seeds( seed, nruns )
+prefixes = [ prefix + '_%02d'%(k+1) for k in range( nruns ) ]
+
+print( 'number of runs=  ', nruns, file=sys.stderr, flush=True )
+print( 'base seed=       ', seed, file=sys.stderr, flush=True )
+print( 'prefix=          ', prefix, file=sys.stderr, flush=True )
+
+runs = train_runs( datafile, trainer, params, prefixes, seeds, nworkers,
+                   scratchdir, start, end, window )
+
+comments = [ 'datafile= ' + datafile, 'trainer= ' + trainer,
+             'base seed= ' + str( seed ) ]
+for labelsfile, s, qe, te in runs:
+    print( labelsfile, ' seed:', s, ' QE:', qe, ' TE:', te,
+           file=sys.stderr, flush=True )
+    comments.append( os.path.basename( labelsfile ) + ' seed= ' + str( s ) )
+
+write_manifest( manifest, [ r[0] for r in runs ], comments )
+print( 'manifest:', manifest, file=sys.stderr, flush=True )
@@ -0,0 +1,125 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file train_pool.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Train several SOMs at once from one shared, memory mapped dataset.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# train several SOMs at once over a process pool.
+#
+# every worker maps the same read-only .npy file, so the training data
+# is in memory once (in the page cache) however many runs there are.
+# each run gets its own seed and mapfile prefix; only the parameters
+# go to the workers and only file names and errors come back.
+
+train_pool_copyright = 'train_pool.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import os
+import sys
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from npyfile import npy_path
+from somfile import read_labels, som_errors
+from feature_store import is_store, store_npy
+
+# -------------------------------------------------------------
+
+# per worker memory map of the training data and settings
+_data = None
+_settings = None
+
+# (copy-on-write, so a trainer writing to its input gets private pages)
+def init_worker( npypath, trainer, params ):
+    global _data, _settings
+    _data = np.load( npypath, mmap_mode='c' )
+    _settings = (trainer, params)
+
+# the training operator, 'msom' or 'batch_som'
+def make_trainer( trainer ):
+
+    if trainer == 'msom':
+        from msom_pack import msom
+        return msom.msom( 'msom' )
+    if trainer == 'batch_som':
+        from batch_som import batch_som
+        return batch_som( 'batch_som' )
+
+    raise RuntimeError( 'train_pool: unknown trainer ' + str( trainer ) )
+
+# one training run; returns its .labels file, seed and errors
+def train_worker( job ):
+
+    prefix, seed = job
+    trainer, params = _settings
+
+    op = make_trainer( trainer )
+    for key, value in params.items():
+        setattr( op.params, key, value )
+    op.params.mapfile_prefix = prefix
+    op.params.seed = seed
+    op.params.output_type = 'labels'
+
+    print( 'training ' + prefix + ' seed ' + str( seed ), file=sys.stderr,
+           flush=True )
+    op.source = _data
+    op.run()
+
+    labelsfile = prefix + '.labels'
+    qe, te = som_errors( read_labels( labelsfile )[0] )
+
+    return labelsfile, seed, qe, te
+
+# nruns seeds drawn from one base seed (drawn itself if None), so a
+# whole set of runs can be repeated from base seed alone
+def run_seeds( seed, nruns ):
+
+    if seed == None:
+        seed = int( np.random.SeedSequence().entropy % 2**32 )
+    seeds = np.random.SeedSequence( seed ).generate_state( nruns )
+
+    return seed, [ int(s) for s in seeds ]
+
+# train one SOM per seed on datafile (with a feature store, over dates
+# start to end and a pixel window), run k writing prefixes[k].labels.
+# returns (labelsfile, seed, qe, te) per run, in run order
+def train_runs( datafile, trainer, params, prefixes, seeds, nworkers,
+                scratchdir, start=None, end=None, window=None ):
+
+    if not os.path.isdir( scratchdir ):
+        os.makedirs( scratchdir )
+
+    # one mappable copy of the data for all workers
+    if is_store( datafile ):
+        npypath = store_npy( datafile, scratchdir, start, end, window )
+    else:
+        npypath = npy_path( datafile, scratchdir )
+
+    print( 'training', len(seeds), trainer, 'runs with', nworkers,
+           'workers', file=sys.stderr, flush=True )
+    with ProcessPoolExecutor( max_workers=nworkers, initializer=init_worker,
+                              initargs=(npypath,trainer,params) ) as pool:
+        runs = list( pool.map( train_worker, zip( prefixes, seeds ) ) )
+
+    return runs
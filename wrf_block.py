@@ -0,0 +1,101 @@
+#! /usr/bin/env /usr/bin/python3
+
+'''
+@file wrf_block.py
+@author Scott L. Williams.
+@package ETO_WEATHER
+@brief Read a day of WRF variables in one pass and prepare all hours at once.
+@LICENSE
+#
+#  Copyright (C) 2020-2022 Scott L. Williams.
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+'''
+
+# read a day of WRF variables in one pass and prepare all hours at once.
+#
+# each wrfout file is opened once and every variable is read with a
+# single netCDF read covering all time slices. the (ny,nx,ntimes,nvars)
+# block then goes through the "prep_eto" operator in one call.
+
+wrf_block_copyright = 'wrf_block.py Copyright (c) 2020-2022 Scott L. Williams, released under GNU GPL V3.0'
+
+import numpy as np
+
+# WRF grids have their origin at the bottom left corner, numpy
+# arrays at the top left. flip rows to match the wrf_source operator.
+flipud = True
+
+# -------------------------------------------------------------
+
+# variable names of a wrf_source band string, in band order;
+# eg. 'TSK:ts,EMISS:ts' gives ['TSK','EMISS']
+def band_names( bandstr ):
+    return [ b.split( ':' )[0] for b in bandstr.split( ',' ) ]
+
+# read time slices 0..ntimes-1 of the named variables from a wrfout file.
+# returns a float32 (ny,nx,ntimes,nvars) block.
+def read_wrf_block( filepath, varnames, ntimes=25 ):
+
+    # netCDF4 is only needed to read, not for band_names or prep_block
+    from netCDF4 import Dataset
+
+    ds = Dataset( filepath, 'r' )
+    ds.set_auto_mask( False )
+
+    block = None
+    for v in range( len(varnames) ):
+
+        # one read per variable; time,y,x
+        values = ds.variables[varnames[v]][0:ntimes,:,:]
+        if flipud:
+            values = values[:,::-1,:]
+
+        if block is None:
+            nt, ny, nx = values.shape
+            block = np.empty( (ny,nx,nt,len(varnames)), dtype=np.float32 )
+
+        block[:,:,:,v] = np.moveaxis( values, 0, 2 )
+
+    ds.close()
+
+    return block
+
+# run the "prep_eto" operator over a whole day block. each hour i is
+# paired with slice i+1 into the 20 band stack that prep_eto averages,
+# exactly as the hourly two-slice band string did. prep_eto works pixel
+# by pixel, so the hours are laid side by side along x and prepared in
+# a single call. returns a (ny,nx,ntimes-1,nout) block.
+# an operator with a day() method (see eto_prep.py) does the whole
+# block itself, each slice once.
+def prep_block( prep, block ):
+
+    if hasattr( prep, 'day' ):
+        return prep.day( block )
+
+    ny, nx, nt, nvars = block.shape
+    nhours = nt - 1
+
+    pairs = np.empty( (ny,nx,nhours,2*nvars), dtype=block.dtype )
+    pairs[:,:,:,:nvars] = block[:,:,:-1,:]
+    pairs[:,:,:,nvars:] = block[:,:,1:,:]
+
+    prep.source = pairs.reshape( (ny,nx*nhours,2*nvars) )
+    prep.run()
+
+    nout = prep.sink.shape[2]
+
+    return prep.sink.reshape( (ny,nx,nhours,nout) )